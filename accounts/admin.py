@@ -1,6 +1,20 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, StripeCustomer, Payment
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from core.db_router import ReplicaChangelistMixin
+from . import rollups
+from .models import (
+    User,
+    StripeCustomer,
+    Payment,
+    WebhookEvent,
+    SyncCursor,
+    QueuedEmail,
+    DailyRevenue,
+    DailyMembership,
+)
 
 
 @admin.register(User)
@@ -28,7 +42,7 @@ class UserAdmin(BaseUserAdmin):
 
 
 @admin.register(StripeCustomer)
-class StripeCustomerAdmin(admin.ModelAdmin):
+class StripeCustomerAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     """Admin configuration for StripeCustomer model."""
 
     list_display = (
@@ -36,6 +50,7 @@ class StripeCustomerAdmin(admin.ModelAdmin):
         'stripe_customer_id',
         'subscription_status',
         'subscription_plan',
+        'monthly_amount',
         'current_period_end',
         'cancel_at_period_end'
     )
@@ -52,6 +67,7 @@ class StripeCustomerAdmin(admin.ModelAdmin):
             'fields': (
                 'subscription_status',
                 'subscription_plan',
+                'monthly_amount',
                 'current_period_end',
                 'cancel_at_period_end'
             )
@@ -61,7 +77,7 @@ class StripeCustomerAdmin(admin.ModelAdmin):
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     """Admin configuration for Payment model."""
 
     list_display = (
@@ -87,3 +103,97 @@ class PaymentAdmin(admin.ModelAdmin):
         }),
         ('Timestamp', {'fields': ('created_at',)}),
     )
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    """Admin configuration for WebhookEvent model."""
+
+    list_display = (
+        'stripe_event_id',
+        'event_type',
+        'stripe_customer_id',
+        'status',
+        'attempts',
+        'duration_ms',
+        'received_at',
+        'processed_at',
+        'next_attempt_at'
+    )
+    list_filter = ('status', 'event_type')
+    search_fields = ('stripe_event_id', 'stripe_customer_id')
+    readonly_fields = ('received_at', 'processed_at', 'duration_ms')
+
+
+@admin.register(SyncCursor)
+class SyncCursorAdmin(admin.ModelAdmin):
+    """Admin configuration for SyncCursor model."""
+
+    list_display = ('name', 'created_gte', 'last_run_at')
+    readonly_fields = ('last_run_at',)
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    """Admin configuration for QueuedEmail model."""
+
+    list_display = ('subject', 'to', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry']
+
+    @admin.action(description='Retry selected emails')
+    def retry(self, request, queryset):
+        count = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=None)
+        self.message_user(request, f'Queued {count} emails for another attempt.')
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Read-only admin for rollup tables, which only the code writes."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(RollupAdmin):
+    """Admin configuration for DailyRevenue model."""
+
+    list_display = ('date', 'currency', 'payment_type', 'amount', 'payments', 'failed_amount', 'failed_payments')
+    list_filter = ('currency', 'payment_type')
+    date_hierarchy = 'date'
+
+
+@admin.register(DailyMembership)
+class DailyMembershipAdmin(RollupAdmin):
+    """Admin configuration for DailyMembership model, plus the revenue dashboard."""
+
+    list_display = ('date', 'new_members', 'churned_members', 'active_members', 'past_due_members', 'mrr')
+    date_hierarchy = 'date'
+    change_list_template = 'admin/accounts/dailymembership/change_list.html'
+
+    def get_urls(self):
+        return [
+            path(
+                'dashboard/',
+                self.admin_site.admin_view(self.dashboard_view),
+                name='accounts_dashboard',
+            ),
+            *super().get_urls(),
+        ]
+
+    def dashboard_view(self, request):
+        """Revenue and membership for the last 30 days, read from the rollups only."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            **rollups.dashboard(days=30),
+            'title': 'Revenue and membership',
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/accounts/dashboard.html', context)
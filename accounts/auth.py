@@ -0,0 +1,71 @@
+"""
+Cached request.user.
+
+AuthenticationMiddleware loads the User with a query on every authenticated
+request. CachedAuthenticationMiddleware keeps the User in Django's cache for
+USER_CACHE_TTL seconds instead, still checking the session's auth hash on
+every request so a password change logs other sessions out. Entries are
+dropped whenever the User is saved or deleted (see accounts.signals).
+"""
+from functools import partial
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def _cache_key(user_id):
+    return f'user:{user_id}'
+
+
+def get_cached_user(request):
+    """Return the request's user, from the cache when the session still verifies."""
+    session = request.session
+    try:
+        user_id = session[SESSION_KEY]
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+
+    if backend_path in settings.AUTHENTICATION_BACKENDS:
+        user = cache.get(_cache_key(user_id))
+        session_hash = session.get(HASH_SESSION_KEY)
+        if user is not None and session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            return user
+
+    # Cache miss or a hash mismatch: Django's full check, which also handles
+    # SECRET_KEY_FALLBACKS and flushes sessions that no longer verify
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(_cache_key(user.pk), user, settings.USER_CACHE_TTL)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def _request_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_cached_user(request)
+    return request._cached_user
+
+
+async def _arequest_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(get_cached_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that serves request.user from the cache."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _request_user(request))
+        request.auser = partial(_arequest_user, request)
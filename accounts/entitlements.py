@@ -0,0 +1,104 @@
+"""
+Per-user membership entitlement cache.
+
+Answers "is this user an active member?" from Django's cache so gating a
+request needs no database query in the common case. Entries map a user ID to
+an Entitlement, expire after ENTITLEMENT_CACHE_TTL seconds and are
+invalidated whenever a StripeCustomer row is written.
+"""
+from collections import namedtuple
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.shortcuts import redirect
+from .models import StripeCustomer
+
+ENTITLEMENT_FIELDS = ('subscription_status', 'current_period_end', 'cancel_at_period_end')
+
+
+class Entitlement(namedtuple('Entitlement', ENTITLEMENT_FIELDS)):
+    """The cached subscription fields of a user's StripeCustomer."""
+
+    __slots__ = ()
+
+    @property
+    def is_active(self):
+        return self.subscription_status in StripeCustomer.ACTIVE_STATUSES
+
+
+# Cached for users without a StripeCustomer so they are not looked up every time
+NO_ENTITLEMENT = Entitlement(None, None, False)
+
+
+def _cache_key(user_id):
+    # v2: entries were (status, period_end) tuples before cancel_at_period_end was added
+    return f'entitlement:v2:{user_id}'
+
+
+def _entitlement_query(user_id):
+    # Always the primary: an entry filled from a lagging replica right after
+    # an invalidation would stay stale for the whole TTL
+    return StripeCustomer.objects.using('default').filter(user_id=user_id).values_list(*ENTITLEMENT_FIELDS)
+
+
+def get_entitlement(user_id):
+    """Return the user's Entitlement."""
+    key = _cache_key(user_id)
+    entitlement = cache.get(key)
+    if entitlement is None:
+        row = _entitlement_query(user_id).first()
+        entitlement = Entitlement(*row) if row else NO_ENTITLEMENT
+        cache.set(key, entitlement, settings.ENTITLEMENT_CACHE_TTL)
+    return entitlement
+
+
+async def aget_entitlement(user_id):
+    """Async version of get_entitlement."""
+    key = _cache_key(user_id)
+    entitlement = await cache.aget(key)
+    if entitlement is None:
+        row = await _entitlement_query(user_id).afirst()
+        entitlement = Entitlement(*row) if row else NO_ENTITLEMENT
+        await cache.aset(key, entitlement, settings.ENTITLEMENT_CACHE_TTL)
+    return entitlement
+
+
+def is_member(user_id):
+    """Return True if the user has an active subscription."""
+    return get_entitlement(user_id).is_active
+
+
+async def ais_member(user_id):
+    """Async version of is_member."""
+    return (await aget_entitlement(user_id)).is_active
+
+
+def invalidate_entitlements(user_ids):
+    """Drop cached entitlements for the given user IDs."""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def member_required(view_func):
+    """Decorator for views that require an active membership."""
+    def _deny(request):
+        messages.error(request, 'An active membership is required to view this page.')
+        return redirect('accounts:dashboard')
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            user = await request.auser()
+            if not await ais_member(user.pk):
+                return _deny(request)
+            return await view_func(request, *args, **kwargs)
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not is_member(request.user.pk):
+                return _deny(request)
+            return view_func(request, *args, **kwargs)
+
+    return login_required(_wrapped_view)
@@ -0,0 +1,457 @@
+"""
+Local stand-in for the Stripe API.
+
+FakeStripe serves the parts of the API this project calls, from memory:
+customers, checkout and billing portal sessions, subscription retrieve, modify
+and list, and invoice list. It can add latency and fail a share of requests,
+so checkout, the portal and sync_stripe can be load-tested offline and
+without test-mode rate limits.
+
+Run it in process with use_fake_stripe(), or as a separate process with
+`manage.py fake_stripe` and point the app at it with STRIPE_API_BASE.
+
+Opening a checkout session's URL completes it. A subscription session then
+creates an active subscription with a paid invoice, and the browser is
+redirected to success_url. Subscriptions the fake has not seen are created on
+first use, so StripeCustomer rows from seeded data work against it. No
+webhooks are sent (see loadtest_webhooks).
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+import uuid
+from .views.stripe_client import logger, stripe
+
+PERIOD_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+_PARAM_KEY_RE = re.compile(r'[^\[\]]+')
+
+_ERROR_TYPES = {
+    400: 'invalid_request_error',
+    402: 'card_error',
+    404: 'invalid_request_error',
+    429: 'rate_limit_error',
+}
+
+
+def decode_params(query):
+    """Decode Stripe's form encoding ("line_items[0][price]=...") into dicts and lists."""
+    params = {}
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        parts = _PARAM_KEY_RE.findall(key)
+        if not parts:
+            continue
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return _listify(params)
+
+
+def _listify(value):
+    if not isinstance(value, dict):
+        return value
+    if value and all(key.isdigit() for key in value):
+        return [_listify(value[key]) for key in sorted(value, key=int)]
+    return {key: _listify(item) for key, item in value.items()}
+
+
+def _bool(value):
+    return str(value).lower() == 'true'
+
+
+def _new_id(prefix):
+    return f'{prefix}_{uuid.uuid4().hex[:24]}'
+
+
+class StripeError(Exception):
+    def __init__(self, status, message, param=None, code=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': {
+            'type': _ERROR_TYPES.get(status, 'api_error'),
+            'message': message,
+            'param': param,
+            'code': code,
+        }}
+
+
+class FakeStripe:
+    """In-memory Stripe API on a local HTTP server."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, error_status=500, seed=None, verbose=False):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.verbose = verbose
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.customers = {}
+        self.checkout_sessions = {}
+        self.portal_sessions = {}
+        self.subscriptions = {}
+        self.invoices = {}
+        self.idempotent_responses = {}
+        self.requests = 0
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self._thread = None
+
+        self.routes = [
+            ('POST', re.compile(r'^/v1/customers$'), self.create_customer),
+            ('GET', re.compile(r'^/v1/customers/(?P<id>[^/]+)$'), self.retrieve_customer),
+            ('POST', re.compile(r'^/v1/checkout/sessions$'), self.create_checkout_session),
+            ('POST', re.compile(r'^/v1/billing_portal/sessions$'), self.create_portal_session),
+            ('GET', re.compile(r'^/v1/subscriptions$'), self.list_subscriptions),
+            ('GET', re.compile(r'^/v1/subscriptions/(?P<id>[^/]+)$'), self.retrieve_subscription),
+            ('POST', re.compile(r'^/v1/subscriptions/(?P<id>[^/]+)$'), self.modify_subscription),
+            ('GET', re.compile(r'^/v1/invoices$'), self.list_invoices),
+        ]
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Request handling
+
+    def handle(self, method, path, params, headers):
+        """Return (status, body dict, extra headers) for an API request."""
+        with self.lock:
+            self.requests += 1
+        delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+        if not headers.get('Authorization'):
+            return 401, {'error': {'type': 'invalid_request_error', 'message': 'No API key provided.'}}, {}
+
+        key = headers.get('Idempotency-Key') if method == 'POST' else None
+        if key:
+            with self.lock:
+                replay = self.idempotent_responses.get(key)
+            if replay:
+                return replay[0], replay[1], {'Idempotent-Replayed': 'true'}
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            error = StripeError(self.error_status, 'Injected failure from the fake Stripe API')
+            return error.status, error.body, {}
+
+        for route_method, pattern, view in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                try:
+                    with self.lock:
+                        status, body = 200, view(params, **match.groupdict())
+                except StripeError as e:
+                    status, body = e.status, e.body
+                break
+        else:
+            error = StripeError(404, f'Unrecognized request URL ({method}: {path})')
+            status, body = error.status, error.body
+
+        if key and status < 500:
+            with self.lock:
+                self.idempotent_responses[key] = (status, body)
+        return status, body, {}
+
+    def complete_checkout(self, session_id):
+        """Complete a checkout session as if the customer paid; returns the redirect URL."""
+        with self.lock:
+            session = self.checkout_sessions.get(session_id)
+            if session is None:
+                return None
+            if session['status'] == 'open':
+                session['status'] = 'complete'
+                session['payment_status'] = 'paid'
+                price = (session.get('line_items') or [{}])[0].get('price', 'price_fake')
+                subscription = None
+                if session['mode'] == 'subscription':
+                    subscription = self._subscription(_new_id('sub'), session['customer'], price)
+                    session['subscription'] = subscription['id']
+                self._invoice(session['customer'], subscription)
+            return session['success_url']
+
+    def portal_return_url(self, session_id):
+        with self.lock:
+            session = self.portal_sessions.get(session_id)
+            return session['return_url'] if session else None
+
+    # Objects
+
+    def _customer(self, customer_id, **fields):
+        customer = {
+            'id': customer_id,
+            'object': 'customer',
+            'created': int(time.time()),
+            'email': None,
+            'name': None,
+            'metadata': {},
+            'livemode': False,
+        }
+        customer.update(fields)
+        self.customers[customer_id] = customer
+        return customer
+
+    def _subscription(self, subscription_id, customer_id, price='price_fake'):
+        now = int(time.time())
+        subscription = {
+            'id': subscription_id,
+            'object': 'subscription',
+            'customer': customer_id,
+            'status': 'active',
+            'created': now,
+            'current_period_start': now,
+            'current_period_end': now + PERIOD_SECONDS,
+            'cancel_at_period_end': False,
+            'cancel_at': None,
+            'items': {'object': 'list', 'data': [{
+                'price': {'id': price, 'unit_amount': 7000, 'recurring': {'interval': 'month', 'interval_count': 1}},
+                'quantity': 1,
+            }]},
+            'metadata': {},
+            'livemode': False,
+        }
+        self.subscriptions[subscription_id] = subscription
+        return subscription
+
+    def _invoice(self, customer_id, subscription=None, amount=7000):
+        invoice_id = _new_id('in')
+        invoice = {
+            'id': invoice_id,
+            'object': 'invoice',
+            'customer': customer_id,
+            'subscription': subscription['id'] if subscription else None,
+            'status': 'paid',
+            'attempted': True,
+            'amount_due': amount,
+            'amount_paid': amount,
+            'currency': 'usd',
+            'created': int(time.time()),
+            'description': 'Membership',
+            'hosted_invoice_url': f'{self.url}/invoices/{invoice_id}',
+            'livemode': False,
+        }
+        self.invoices[invoice_id] = invoice
+        return invoice
+
+    def _get_subscription(self, subscription_id):
+        subscription = self.subscriptions.get(subscription_id)
+        if subscription is None:
+            subscription = self._subscription(subscription_id, None)
+        return subscription
+
+    # API endpoints, called with self.lock held
+
+    def create_customer(self, params):
+        return self._customer(
+            _new_id('cus'),
+            email=params.get('email'),
+            name=params.get('name'),
+            metadata=params.get('metadata', {}),
+        )
+
+    def retrieve_customer(self, params, id):
+        if id not in self.customers:
+            raise StripeError(404, f"No such customer: '{id}'", param='id', code='resource_missing')
+        return self.customers[id]
+
+    def create_checkout_session(self, params):
+        if params.get('mode') not in ('payment', 'subscription', 'setup'):
+            raise StripeError(400, 'Missing required param: mode.', param='mode', code='parameter_missing')
+        session_id = _new_id('cs_test')
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'customer': params.get('customer'),
+            'mode': params['mode'],
+            'line_items': params.get('line_items', []),
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'subscription': None,
+            'success_url': params.get('success_url'),
+            'cancel_url': params.get('cancel_url'),
+            'url': f'{self.url}/checkout/{session_id}',
+            'livemode': False,
+        }
+        self.checkout_sessions[session_id] = session
+        return session
+
+    def create_portal_session(self, params):
+        if not params.get('customer'):
+            raise StripeError(400, 'Missing required param: customer.', param='customer', code='parameter_missing')
+        session_id = _new_id('bps')
+        session = {
+            'id': session_id,
+            'object': 'billing_portal.session',
+            'customer': params['customer'],
+            'return_url': params.get('return_url'),
+            'url': f'{self.url}/portal/{session_id}',
+            'livemode': False,
+        }
+        self.portal_sessions[session_id] = session
+        return session
+
+    def retrieve_subscription(self, params, id):
+        return self._get_subscription(id)
+
+    def modify_subscription(self, params, id):
+        subscription = self._get_subscription(id)
+        if 'cancel_at_period_end' in params:
+            subscription['cancel_at_period_end'] = _bool(params['cancel_at_period_end'])
+            subscription['cancel_at'] = subscription['current_period_end'] if subscription['cancel_at_period_end'] else None
+        if 'metadata' in params:
+            subscription['metadata'].update(params['metadata'])
+        return subscription
+
+    def list_subscriptions(self, params):
+        status = params.get('status')
+        return self._list('/v1/subscriptions', self.subscriptions.values(), params, lambda subscription: (
+            status == 'all'
+            or (subscription['status'] == status if status else subscription['status'] != 'canceled')
+        ))
+
+    def list_invoices(self, params):
+        status = params.get('status')
+        subscription = params.get('subscription')
+        return self._list('/v1/invoices', self.invoices.values(), params, lambda invoice: (
+            (not status or invoice['status'] == status)
+            and (not subscription or invoice['subscription'] == subscription)
+        ))
+
+    def _list(self, url, objects, params, matches):
+        """Stripe list response: newest first, with limit and starting_after pagination."""
+        created = params.get('created', {})
+        if not isinstance(created, dict):
+            created = {'eq': created}
+        bounds = {name: int(value) for name, value in created.items()}
+
+        def in_range(obj):
+            return (
+                obj['created'] >= bounds.get('gte', obj['created'])
+                and obj['created'] > bounds.get('gt', obj['created'] - 1)
+                and obj['created'] <= bounds.get('lte', obj['created'])
+                and obj['created'] < bounds.get('lt', obj['created'] + 1)
+                and obj['created'] == bounds.get('eq', obj['created'])
+            )
+
+        customer = params.get('customer')
+        selected = [
+            obj for obj in reversed(list(objects))
+            if matches(obj) and in_range(obj) and (not customer or obj['customer'] == customer)
+        ]
+
+        starting_after = params.get('starting_after')
+        if starting_after:
+            ids = [obj['id'] for obj in selected]
+            selected = selected[ids.index(starting_after) + 1:] if starting_after in ids else []
+
+        limit = min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        return {
+            'object': 'list',
+            'url': url,
+            'data': selected[:limit],
+            'has_more': len(selected) > limit,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, the body
+    # waits for the client's delayed ACK and every call gains ~40ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else ''
+
+        # Browser-facing pages behind the session URLs
+        if method == 'GET' and url.path.startswith(('/checkout/', '/portal/')):
+            kind, _, session_id = url.path.strip('/').partition('/')
+            if kind == 'checkout':
+                location = fake.complete_checkout(session_id)
+            else:
+                location = fake.portal_return_url(session_id)
+            if location:
+                self._send(303, b'', {'Location': location})
+            else:
+                self._send(404, b'Not found', {'Content-Type': 'text/plain'})
+            return
+
+        params = decode_params(url.query if method == 'GET' else body)
+        status, payload, headers = fake.handle(method, url.path, params, self.headers)
+        self._send(status, json.dumps(payload).encode(), {
+            'Content-Type': 'application/json',
+            'Request-Id': f'req_{uuid.uuid4().hex[:14]}',
+            **headers,
+        })
+
+    def _send(self, status, content, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if self.server.fake.verbose:
+            logger.info(f"Fake Stripe: {format % args}")
+
+
+@contextmanager
+def use_fake_stripe(**options):
+    """
+    Run a FakeStripe in this process and point the Stripe SDK at it.
+
+    Takes the FakeStripe constructor arguments and yields the running fake.
+    """
+    with FakeStripe(**options) as fake:
+        previous = stripe.api_base, stripe.api_key
+        stripe.api_base = fake.url
+        stripe.api_key = stripe.api_key or 'sk_test_fake'
+        try:
+            yield fake
+        finally:
+            stripe.api_base, stripe.api_key = previous
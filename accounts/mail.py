@@ -0,0 +1,26 @@
+"""
+Queued email backend.
+
+With EMAIL_QUEUE enabled this is the EMAIL_BACKEND. Allauth's login codes and
+confirmation emails are then written to the QueuedEmail table, so the login
+and signup requests no longer wait on the mail server (and slow SMTP no longer
+eats into ACCOUNT_LOGIN_BY_CODE_TIMEOUT). `manage.py send_queued_email`
+delivers them through EMAIL_DELIVERY_BACKEND. The rows are written in the
+request's transaction, so mail from a request that rolls back is never sent.
+"""
+from django.core.mail.backends.base import BaseEmailBackend
+from .models import QueuedEmail
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Store outgoing messages for the send_queued_email worker."""
+
+    def send_messages(self, email_messages):
+        try:
+            queued = [QueuedEmail.from_message(message) for message in email_messages if message.recipients()]
+            QueuedEmail.objects.bulk_create(queued)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+        return len(queued)
@@ -0,0 +1,77 @@
+"""
+Management command to run the local Stripe API stand-in (accounts.fake_stripe).
+"""
+from django.core.management.base import BaseCommand
+from accounts.fake_stripe import FakeStripe
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Stripe API for offline load and integration testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            default='127.0.0.1',
+            help='Address to listen on (default: 127.0.0.1)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=12111,
+            help='Port to listen on (default: 12111)'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0,
+            help='Milliseconds added to every API response (default: 0)'
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0,
+            help='Up to this many more milliseconds, chosen at random per response (default: 0)'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0,
+            help='Share of API requests that fail, e.g. 0.01 for 1%% (default: 0)'
+        )
+        parser.add_argument(
+            '--error-status',
+            type=int,
+            default=500,
+            help='HTTP status of injected failures, e.g. 429 or 500 (default: 500)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for latency jitter and injected failures'
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Log every request'
+        )
+
+    def handle(self, *args, **options):
+        fake = FakeStripe(
+            host=options['host'],
+            port=options['port'],
+            latency_ms=options['latency'],
+            jitter_ms=options['jitter'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            seed=options['seed'],
+            verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Fake Stripe API listening on {fake.url}'))
+        self.stdout.write(f'Start the site with STRIPE_API_BASE={fake.url} to use it. Press Ctrl+C to stop.')
+        try:
+            fake.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.server.server_close()
+            self.stdout.write(f'Served {fake.requests} API requests')
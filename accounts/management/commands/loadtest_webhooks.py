@@ -0,0 +1,399 @@
+"""
+Management command to load-test the Stripe webhook endpoint.
+
+Generates a signed event stream for seeded load-test customers (see
+accounts.seed and accounts.webhook_sim), or replays a recorded JSONL capture,
+and posts it to stripe_webhook at a given rate and concurrency. Requests go
+through the full middleware stack in process, or over HTTP to a running
+server with --url. Reports throughput, latency percentiles and queries per
+event, then checks that StripeCustomer and Payment rows match the stream.
+
+Run it against a development or staging database only.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+import json
+import re
+import threading
+import time
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts import seed
+from accounts.models import Payment, StripeCustomer, WebhookEvent
+from accounts.webhook_sim import expected_state, generate_events, sign
+
+# Query count from the Server-Timing header set by RequestMetricsMiddleware
+_SERVER_TIMING_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+LOADTEST_SECRET = 'whsec_loadtest'
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Command(BaseCommand):
+    help = 'Load-test the Stripe webhook endpoint with generated or recorded events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--customers',
+            type=int,
+            default=50,
+            help='Number of load-test customers to seed and generate events for (default: 50)'
+        )
+        parser.add_argument(
+            '--cycles',
+            type=int,
+            default=3,
+            help='Billing periods per customer (default: 3)'
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0.1,
+            help='Probability that a renewal payment fails (default: 0.1)'
+        )
+        parser.add_argument(
+            '--cancel-rate',
+            type=float,
+            default=0.1,
+            help='Probability that a customer cancels at the end (default: 0.1)'
+        )
+        parser.add_argument(
+            '--out-of-order',
+            type=float,
+            default=0.05,
+            help='Probability that an event swaps places with the next one (default: 0.05)'
+        )
+        parser.add_argument(
+            '--duplicates',
+            type=float,
+            default=0.05,
+            help='Probability that an event is delivered a second time (default: 0.05)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, for a repeatable stream'
+        )
+        parser.add_argument(
+            '--replay',
+            metavar='PATH',
+            help='Send the events in a JSONL file (one Stripe event per line) instead of generating them'
+        )
+        parser.add_argument(
+            '--record',
+            metavar='PATH',
+            help='Write the generated events to a JSONL file for later --replay'
+        )
+        parser.add_argument(
+            '--url',
+            help='Post to a running server (e.g., http://localhost:8000/account/webhook) instead of in process'
+        )
+        parser.add_argument(
+            '--secret',
+            help='Webhook signing secret (default: STRIPE_WEBHOOK_SECRET)'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Events per second to send, 0 for as fast as possible (default: 0)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Number of concurrent senders (default: 4)'
+        )
+        parser.add_argument(
+            '--settle',
+            type=float,
+            default=30,
+            help='Seconds to wait for queued events to be processed before checking (default: 30)'
+        )
+        parser.add_argument(
+            '--no-check',
+            action='store_true',
+            help='Skip the consistency check'
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete all load-test users, payments and webhook events, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted = seed.delete_seeded()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} load-test rows'))
+            return
+
+        events = self._load_events(options) if options['replay'] else self._generate_events(options)
+        if not events:
+            raise CommandError('No events to send')
+
+        if options['record']:
+            with open(options['record'], 'w') as f:
+                for event in events:
+                    f.write(json.dumps(event) + '\n')
+            self.stdout.write(f"Recorded {len(events)} events to {options['record']}")
+
+        secret = options['secret'] or settings.STRIPE_WEBHOOK_SECRET
+        if options['url']:
+            if not secret:
+                raise CommandError('Pass --secret or set STRIPE_WEBHOOK_SECRET to match the server')
+            send = self._http_sender(options['url'])
+        else:
+            # In process the endpoint can be pointed at our own secret
+            secret = secret or LOADTEST_SECRET
+            send = self._inprocess_sender()
+
+        with override_settings(STRIPE_WEBHOOK_SECRET=secret):
+            results, elapsed = self._run(events, send, secret, options['rate'], options['concurrency'])
+        self._report(results, elapsed, options['concurrency'])
+
+        if not options['no_check']:
+            event_ids = {event['id'] for event in events}
+            if settings.STRIPE_WEBHOOK_QUEUE and not options['url']:
+                call_command('process_webhooks', stdout=self.stdout)
+            self._wait_for_ledger(event_ids, options['settle'])
+            self._check(expected_state(events), event_ids)
+
+    def _generate_events(self, options):
+        customer_ids = seed.seed_customers(options['customers'])
+        # Start after any event already applied to these customers, so a
+        # rerun is not ignored as stale
+        latest = max(
+            StripeCustomer.objects
+            .filter(stripe_customer_id__in=customer_ids)
+            .values_list('last_event_created', flat=True),
+            default=None,
+        ) or 0
+        events = generate_events(
+            customer_ids,
+            cycles=options['cycles'],
+            failure_rate=options['failure_rate'],
+            cancel_rate=options['cancel_rate'],
+            out_of_order=options['out_of_order'],
+            duplicates=options['duplicates'],
+            start=max(int(time.time()), latest + 1),
+            seed=options['seed'],
+        )
+        self.stdout.write(f'Generated {len(events)} events for {len(customer_ids)} customers')
+        return events
+
+    def _load_events(self, options):
+        try:
+            with open(options['replay']) as f:
+                events = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['replay']}: {str(e)}")
+        self.stdout.write(f"Loaded {len(events)} events from {options['replay']}")
+
+        # A recorded load-test stream needs its customers on a fresh database
+        seeded = [
+            int(customer[len(seed.CUSTOMER_PREFIX):])
+            for customer in expected_state(events)['customers']
+            if customer.startswith(seed.CUSTOMER_PREFIX)
+        ]
+        if seeded:
+            seed.seed_customers(max(seeded) + 1)
+        return events
+
+    def _inprocess_sender(self):
+        path = reverse('accounts:stripe_webhook')
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        local = threading.local()
+
+        def send(payload, signature):
+            if not hasattr(local, 'client'):
+                local.client = Client(HTTP_HOST=host)
+            with CaptureQueriesContext(connection) as queries:
+                response = local.client.post(
+                    path, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature
+                )
+            return response.status_code, len(queries)
+
+        return send
+
+    def _http_sender(self, url):
+        import requests
+
+        local = threading.local()
+
+        def send(payload, signature):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            try:
+                response = local.session.post(
+                    url,
+                    data=payload.encode(),
+                    headers={'Content-Type': 'application/json', 'Stripe-Signature': signature},
+                    timeout=30,
+                )
+            except requests.RequestException as e:
+                return type(e).__name__, None
+            match = _SERVER_TIMING_QUERIES_RE.search(response.headers.get('Server-Timing', ''))
+            return response.status_code, int(match.group(1)) if match else None
+
+        return send
+
+    def _run(self, events, send, secret, rate, concurrency):
+        """Send every event; returns ([(event_type, status, latency_ms, queries)], elapsed seconds)."""
+        payloads = [(event['type'], json.dumps(event)) for event in events]
+        jobs = iter(enumerate(payloads))
+        lock = threading.Lock()
+        results = []
+        started = time.perf_counter()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        job = next(jobs, None)
+                    if job is None:
+                        return
+                    index, (event_type, payload) = job
+
+                    if rate:
+                        # Latency counts from the scheduled send time, so a
+                        # server that falls behind shows up in the percentiles
+                        scheduled = started + index / rate
+                        delay = scheduled - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    else:
+                        scheduled = time.perf_counter()
+
+                    status, queries = send(payload, sign(payload, secret))
+                    results.append((event_type, status, (time.perf_counter() - scheduled) * 1000, queries))
+            finally:
+                # Each sender thread holds its own database connection
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def _report(self, results, elapsed, concurrency):
+        latencies = sorted(latency for _, _, latency, _ in results)
+        statuses = Counter(status for _, status, _, _ in results)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSent {len(results)} events in {elapsed:.2f}s '
+            f'({len(results) / elapsed:.1f} events/s, concurrency {concurrency})'
+        ))
+        self.stdout.write('Responses: ' + ', '.join(f'{status} x{count}' for status, count in statuses.most_common()))
+        self.stdout.write(
+            f'Latency ms: p50 {percentile(latencies, 0.50):.1f}  p95 {percentile(latencies, 0.95):.1f}  '
+            f'p99 {percentile(latencies, 0.99):.1f}  max {latencies[-1]:.1f}'
+        )
+
+        queries = defaultdict(list)
+        for event_type, _, _, count in results:
+            if count is not None:
+                queries[event_type].append(count)
+        if queries:
+            self.stdout.write('Queries per event (mean / max):')
+            for event_type, counts in sorted(queries.items()):
+                self.stdout.write(f'  {event_type:<32} {sum(counts) / len(counts):5.1f} / {max(counts)}')
+        else:
+            self.stdout.write('Queries per event: unavailable (enable SERVER_TIMING on the server)')
+
+    def _wait_for_ledger(self, event_ids, timeout):
+        """Wait until none of the events is still pending or processing."""
+        deadline = time.monotonic() + timeout
+        while True:
+            waiting = sum(
+                WebhookEvent.objects
+                .filter(stripe_event_id__in=chunk, status__in=('pending', 'processing'))
+                .count()
+                for chunk in _chunks(event_ids)
+            )
+            if not waiting or time.monotonic() >= deadline:
+                return
+            time.sleep(0.5)
+
+    def _check(self, expected, event_ids):
+        """Compare StripeCustomer, Payment and ledger rows against the stream."""
+        problems = []
+
+        customers = {}
+        for chunk in _chunks(expected['customers']):
+            customers.update(
+                (stripe_id, (user_id, status))
+                for stripe_id, user_id, status in StripeCustomer.objects
+                .filter(stripe_customer_id__in=chunk)
+                .values_list('stripe_customer_id', 'user_id', 'subscription_status')
+            )
+        for stripe_id, status in expected['customers'].items():
+            if stripe_id not in customers:
+                problems.append(f'{stripe_id}: no StripeCustomer row')
+            elif customers[stripe_id][1] != status:
+                problems.append(f'{stripe_id}: subscription_status is {customers[stripe_id][1]!r}, expected {status!r}')
+
+        payments = {}
+        for chunk in _chunks(expected['payments']):
+            payments.update((payment.stripe_payment_id, payment) for payment in Payment.objects.filter(stripe_payment_id__in=chunk))
+        for payment_id, want in expected['payments'].items():
+            payment = payments.get(payment_id)
+            if payment is None:
+                if want['customer'] in customers:
+                    problems.append(f'{payment_id}: no Payment row')
+                continue
+            got = {
+                'user': payment.user_id,
+                'status': payment.status,
+                'amount': Decimal(payment.amount),
+                'currency': payment.currency,
+            }
+            want = {**want, 'user': customers[want['customer']][0]}
+            for field, value in got.items():
+                if value != want[field]:
+                    problems.append(f'{payment_id}: {field} is {value!r}, expected {want[field]!r}')
+
+        ledger = Counter()
+        for chunk in _chunks(event_ids):
+            ledger.update(dict(
+                WebhookEvent.objects.filter(stripe_event_id__in=chunk)
+                .values_list('status').annotate(count=Count('id'))
+            ))
+        missing = len(event_ids) - sum(ledger.values())
+        if missing:
+            problems.append(f'{missing} events missing from the webhook ledger')
+        for status in ('pending', 'processing', 'failed'):
+            if ledger[status]:
+                problems.append(f'{ledger[status]} events left {status} in the webhook ledger')
+
+        self.stdout.write(
+            f"\nConsistency: {len(expected['customers'])} customers, {len(expected['payments'])} payments, "
+            f"{len(event_ids)} ledger entries checked"
+        )
+        if problems:
+            for problem in problems[:20]:
+                self.stdout.write(self.style.ERROR(f'  ✗ {problem}'))
+            if len(problems) > 20:
+                self.stdout.write(self.style.ERROR(f'  ... and {len(problems) - 20} more'))
+            raise CommandError(f'{len(problems)} consistency problems')
+        self.stdout.write(self.style.SUCCESS('✓ StripeCustomer, Payment and ledger rows match the event stream'))
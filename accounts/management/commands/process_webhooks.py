@@ -0,0 +1,145 @@
+"""
+Management command to drain the queued Stripe webhook events.
+
+Events are claimed in batches and grouped by Stripe customer. Groups run
+concurrently, but the events inside a group are always applied one after
+another in the order they were received, so each customer sees its events in
+order. Run a single worker per database and scale with --concurrency.
+Failed events are retried with exponential backoff, and a customer's later
+events wait until the retried one has gone through.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from accounts.models import WebhookEvent
+from accounts.views.webhooks import apply_webhook_event
+
+
+class Command(BaseCommand):
+    help = 'Process queued Stripe webhook events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of events to claim per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of customers processed in parallel (default: 1)'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Attempts before an event is marked as failed (default: 5)'
+        )
+        parser.add_argument(
+            '--retry-delay',
+            type=float,
+            default=30.0,
+            help='Seconds before the first retry, doubled for each later one (default: 30)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new events instead of exiting when the queue is empty'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)'
+        )
+        parser.add_argument(
+            '--requeue-processing',
+            action='store_true',
+            help='Reset events left in "processing" by a crashed worker back to pending'
+        )
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        self.retry_delay = options['retry_delay']
+
+        if options['requeue_processing']:
+            count = WebhookEvent.objects.filter(status='processing').update(status='pending')
+            self.stdout.write(f'Requeued {count} events left in processing')
+
+        total = 0
+        while True:
+            batch = self._claim_batch(options['batch_size'])
+
+            if not batch:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            groups = {}
+            for event in batch:
+                # Events without a customer have no ordering constraint
+                key = event.stripe_customer_id or f'event:{event.pk}'
+                groups.setdefault(key, []).append(event)
+
+            if options['concurrency'] > 1:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    total += sum(pool.map(self._process_group_in_thread, groups.values()))
+            else:
+                total += sum(map(self._process_group, groups.values()))
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} webhook events'))
+
+    def _claim_batch(self, batch_size):
+        """Mark the oldest due pending events as processing and return them."""
+        now = timezone.now()
+        # Customers with an event still in flight, or waiting for its retry,
+        # must wait so order is kept
+        busy_customers = WebhookEvent.objects.filter(
+            Q(status='processing') | Q(status='pending', next_attempt_at__gt=now),
+            stripe_customer_id__isnull=False,
+        ).values('stripe_customer_id')
+
+        with transaction.atomic():
+            batch = list(
+                WebhookEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+                .exclude(stripe_customer_id__in=busy_customers)
+                .order_by('id')[:batch_size]
+            )
+            WebhookEvent.objects.filter(
+                pk__in=[event.pk for event in batch]
+            ).update(status='processing')
+
+        return batch
+
+    def _process_group_in_thread(self, events):
+        try:
+            return self._process_group(events)
+        finally:
+            # Each worker thread holds its own database connection
+            connection.close()
+
+    def _process_group(self, events):
+        """Apply one customer's events in order, stopping at the first failure."""
+        processed = 0
+        for index, event in enumerate(events):
+            if not apply_webhook_event(event, max_attempts=self.max_attempts, retry_delay=self.retry_delay):
+                self.stderr.write(f'Error processing {event.stripe_event_id}: {event.last_error}')
+
+                # Put the rest of the group back so it runs after the retry
+                WebhookEvent.objects.filter(
+                    pk__in=[later.pk for later in events[index + 1:]]
+                ).update(status='pending')
+                break
+
+            processed += 1
+
+        return processed
@@ -0,0 +1,142 @@
+"""
+Management command to create Stripe customers for users that do not have one yet.
+
+The users table is the queue: every active, verified user without a
+StripeCustomer is pending, so nothing is lost when a worker restarts. With
+--loop the command keeps polling, which provisions new users shortly after
+they confirm their email. Failed users are retried with exponential backoff
+and skipped after --max-attempts until the worker restarts.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import math
+import time
+from django.core.management.base import BaseCommand
+from accounts.entitlements import invalidate_entitlements
+from accounts.models import StripeCustomer, User
+from accounts.provisioning import stripe_customer_params
+from accounts.views.stripe_client import stripe
+
+
+class Command(BaseCommand):
+    help = 'Provision Stripe customers in batches for users without one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Users per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Parallel Stripe requests per batch (default: 4)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after provisioning this many users'
+        )
+        parser.add_argument(
+            '--include-unverified',
+            action='store_true',
+            help='Also provision users who have not confirmed their email yet'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Attempts before a user is skipped until the next start (default: 5)'
+        )
+        parser.add_argument(
+            '--retry-delay',
+            type=float,
+            default=30.0,
+            help='Seconds before the first retry, doubled for each later one (default: 30)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new users instead of exiting when none are left'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when no users are pending (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True, stripe_customer__isnull=True).order_by('pk')
+        if not options['include_unverified']:
+            users = users.filter(emailaddress__verified=True).distinct()
+
+        self.max_attempts = options['max_attempts']
+        self.retry_delay = options['retry_delay']
+        # user id -> (failed attempts, time.monotonic() of the next attempt)
+        self.failures = {}
+
+        provisioned = failed = 0
+        last_pk = 0
+        while options['limit'] is None or provisioned < options['limit']:
+            size = options['batch_size']
+            if options['limit'] is not None:
+                size = min(size, options['limit'] - provisioned)
+
+            batch = list(users.filter(pk__gt=last_pk).exclude(pk__in=self._backing_off())[:size])
+            if not batch:
+                if not options['loop']:
+                    break
+                # Start over to pick up newly confirmed users and due retries
+                time.sleep(options['sleep'])
+                last_pk = 0
+                continue
+            last_pk = batch[-1].pk
+
+            with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+                results = list(pool.map(self._create_customer, batch))
+
+            rows = [
+                StripeCustomer(user=user, stripe_customer_id=customer_id)
+                for user, customer_id in zip(batch, results)
+                if customer_id
+            ]
+            # Checkout may have provisioned some of these users in the meantime
+            StripeCustomer.objects.bulk_create(rows, ignore_conflicts=True)
+            # bulk_create sends no post_save, which would drop their cached "no customer"
+            invalidate_entitlements([row.user_id for row in rows])
+
+            for user, customer_id in zip(batch, results):
+                if customer_id:
+                    self.failures.pop(user.pk, None)
+                else:
+                    self._record_failure(user)
+
+            provisioned += len(rows)
+            failed += len(batch) - len(rows)
+            self.stdout.write(f'Provisioned {provisioned} customers so far')
+
+        self.stdout.write(self.style.SUCCESS(f'Provisioned {provisioned} Stripe customers, {failed} failed'))
+
+    def _backing_off(self):
+        """IDs of failed users whose next attempt is not due yet."""
+        now = time.monotonic()
+        return [user_id for user_id, (_, retry_at) in self.failures.items() if retry_at > now]
+
+    def _record_failure(self, user):
+        """Schedule the user's next attempt, or skip them after --max-attempts."""
+        attempts = self.failures.get(user.pk, (0, 0))[0] + 1
+        if attempts >= self.max_attempts:
+            retry_at = math.inf
+            self.stderr.write(f'Giving up on {user.email} after {attempts} attempts')
+        else:
+            retry_at = time.monotonic() + self.retry_delay * 2 ** (attempts - 1)
+        self.failures[user.pk] = (attempts, retry_at)
+
+    def _create_customer(self, user):
+        try:
+            return stripe.Customer.create(**stripe_customer_params(user)).id
+        except Exception as e:
+            self.stderr.write(f'Error creating Stripe customer for {user.email}: {e}')
+            return None
@@ -0,0 +1,49 @@
+"""
+Management command to recompute the revenue and membership rollups.
+
+The webhook handlers keep DailyRevenue and DailyMembership current. Run this
+after importing or editing payments by hand, or to fill the rollups the first
+time. DailyRevenue is recomputed from Payment (every day, or only --since a
+date). The membership totals for today (active and past due members, MRR) are
+recomputed from StripeCustomer. New and churned counts are only recorded by
+the webhook handlers as members change, so they cannot be rebuilt.
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounts.rollups import rebuild_membership_totals, rebuild_revenue
+
+
+class Command(BaseCommand):
+    help = 'Recompute DailyRevenue from Payment and the membership totals from StripeCustomer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            metavar='YYYY-MM-DD',
+            help='Only recompute revenue from this date on (default: every day)'
+        )
+        parser.add_argument(
+            '--only',
+            choices=['revenue', 'membership'],
+            help='Only rebuild one of the rollups'
+        )
+
+    def handle(self, *args, **options):
+        if options['only'] != 'membership':
+            since = None
+            if options['since']:
+                try:
+                    since = date.fromisoformat(options['since'])
+                except ValueError:
+                    raise CommandError(f"--since must be a date like 2026-01-31, not {options['since']!r}")
+
+            rows = rebuild_revenue(since=since)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} DailyRevenue rows'))
+
+        if options['only'] != 'revenue':
+            totals = rebuild_membership_totals()
+            self.stdout.write(self.style.SUCCESS(
+                f"Membership: {totals['active_members']} active, {totals['past_due_members']} past due, "
+                f"MRR {totals['mrr']}"
+            ))
+
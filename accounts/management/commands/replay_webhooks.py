@@ -0,0 +1,77 @@
+"""
+Management command to replay recorded Stripe webhook events from the ledger.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from accounts.models import WebhookEvent
+from accounts.views.webhooks import apply_webhook_event
+
+
+class Command(BaseCommand):
+    help = 'Replay recorded Stripe webhook events from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'event_ids',
+            nargs='*',
+            help='Stripe event IDs to replay (optional, use filters instead)'
+        )
+        parser.add_argument(
+            '--status',
+            choices=[choice for choice, _ in WebhookEvent.STATUS_CHOICES],
+            help='Only replay events with this status (e.g., failed)'
+        )
+        parser.add_argument(
+            '--type',
+            dest='event_type',
+            help='Only replay events of this type (e.g., invoice.payment_succeeded)'
+        )
+        parser.add_argument(
+            '--customer-id',
+            help='Only replay events for this Stripe customer ID'
+        )
+        parser.add_argument(
+            '--since',
+            help='Only replay events received at or after this ISO 8601 datetime'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the matching events without replaying them'
+        )
+
+    def handle(self, *args, **options):
+        events = WebhookEvent.objects.order_by('id')
+
+        if options['event_ids']:
+            events = events.filter(stripe_event_id__in=options['event_ids'])
+        if options['status']:
+            events = events.filter(status=options['status'])
+        if options['event_type']:
+            events = events.filter(event_type=options['event_type'])
+        if options['customer_id']:
+            events = events.filter(stripe_customer_id=options['customer_id'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+            events = events.filter(received_at__gte=since)
+
+        if not any(options[key] for key in ('event_ids', 'status', 'event_type', 'customer_id', 'since')):
+            raise CommandError('Pass event IDs or at least one filter to select events to replay')
+
+        replayed = failed = 0
+        for event in events.iterator():
+            if options['dry_run']:
+                self.stdout.write(f'{event.stripe_event_id} {event.event_type} ({event.status})')
+                continue
+
+            if apply_webhook_event(event):
+                replayed += 1
+                self.stdout.write(f'✓ {event.stripe_event_id} {event.event_type} ({event.duration_ms:.1f} ms)')
+            else:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'✗ {event.stripe_event_id} {event.event_type}: {event.last_error}'))
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} events, {failed} failed'))
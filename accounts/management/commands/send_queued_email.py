@@ -0,0 +1,184 @@
+"""
+Management command to deliver the email queued by QueuedEmailBackend.
+
+Messages are claimed in batches and sent one by one over a single connection
+to EMAIL_DELIVERY_BACKEND, which stays open while there is mail to send, so
+an SMTP server sees one login per busy period instead of one per message.
+Failed messages are retried with exponential backoff. After --max-attempts,
+or right away when the server rejects them permanently (5xx), they are
+marked as failed and left in the table. Sent messages, which include login
+codes in plain text, are deleted once they are older than --keep-sent hours.
+"""
+from datetime import timedelta
+import smtplib
+import time
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from accounts.models import QueuedEmail
+
+# The server refused the message; smtplib resets the session, so the
+# connection can be reused for the next one
+REJECTED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+# Seconds between deletions of old sent messages while running with --loop
+PURGE_INTERVAL = 600
+
+
+def _is_permanent(error):
+    """Whether retrying cannot help, e.g. every recipient was rejected."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class Command(BaseCommand):
+    help = 'Send queued email'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of messages to claim per batch (default: 50)'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Attempts before a message is marked as failed (default: 5)'
+        )
+        parser.add_argument(
+            '--retry-delay',
+            type=float,
+            default=30.0,
+            help='Seconds before the first retry, doubled for each later one (default: 30)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new messages instead of exiting when the queue is empty'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty (default: 1)'
+        )
+        parser.add_argument(
+            '--keep-sent',
+            type=float,
+            default=24.0,
+            help='Hours to keep sent messages before deleting them (default: 24)'
+        )
+        parser.add_argument(
+            '--requeue-sending',
+            action='store_true',
+            help='Reset messages left in "sending" by a crashed worker back to pending'
+        )
+
+    def handle(self, *args, **options):
+        self.max_attempts = options['max_attempts']
+        self.retry_delay = options['retry_delay']
+
+        if options['requeue_sending']:
+            count = QueuedEmail.objects.filter(status='sending').update(status='pending')
+            self.stdout.write(f'Requeued {count} messages left in sending')
+
+        self.keep_sent = timedelta(hours=options['keep_sent'])
+        self._purge_sent()
+        last_purge = time.monotonic()
+
+        self.connection = get_connection(settings.EMAIL_DELIVERY_BACKEND, fail_silently=False)
+        sent = failed = 0
+        try:
+            while True:
+                batch = self._claim_batch(options['batch_size'])
+
+                if not batch:
+                    # Servers drop idle connections, so don't hold one while waiting
+                    self.connection.close()
+                    if not options['loop']:
+                        break
+                    if time.monotonic() - last_purge >= PURGE_INTERVAL:
+                        self._purge_sent()
+                        last_purge = time.monotonic()
+                    time.sleep(options['sleep'])
+                    continue
+
+                batch_sent, batch_failed = self._send_batch(batch)
+                sent += batch_sent
+                failed += batch_failed
+        finally:
+            self.connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} messages, {failed} failed permanently'))
+
+    def _purge_sent(self):
+        """Delete sent messages older than --keep-sent."""
+        count, _ = QueuedEmail.objects.filter(
+            status='sent',
+            sent_at__lt=timezone.now() - self.keep_sent,
+        ).delete()
+        if count:
+            self.stdout.write(f'Deleted {count} sent messages')
+
+    def _claim_batch(self, batch_size):
+        """Mark the oldest due messages as sending and return them."""
+        with transaction.atomic():
+            batch = list(
+                QueuedEmail.objects
+                .select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+                .order_by('id')[:batch_size]
+            )
+            QueuedEmail.objects.filter(
+                pk__in=[queued.pk for queued in batch]
+            ).update(status='sending')
+
+        return batch
+
+    def _send_batch(self, batch):
+        """Send a batch over the shared connection, returning (sent, failed) counts."""
+        sent_ids = []
+        failed = 0
+        for queued in batch:
+            try:
+                # Opens the connection if it is closed; a no-op otherwise
+                self.connection.open()
+                self.connection.send_messages([queued.to_message(self.connection)])
+            except Exception as e:
+                if not isinstance(e, REJECTED):
+                    # The connection may be broken; the next message reconnects
+                    self.connection.close()
+                if self._record_failure(queued, e):
+                    failed += 1
+                continue
+            sent_ids.append(queued.pk)
+
+        QueuedEmail.objects.filter(pk__in=sent_ids).update(
+            status='sent',
+            attempts=F('attempts') + 1,
+            last_error=None,
+            sent_at=timezone.now(),
+        )
+        return len(sent_ids), failed
+
+    def _record_failure(self, queued, error):
+        """Schedule a retry or dead-letter the message; True if it failed for good."""
+        queued.attempts += 1
+        queued.last_error = f'{type(error).__name__}: {error}'
+        if queued.attempts >= self.max_attempts or _is_permanent(error):
+            queued.status = 'failed'
+            self.stderr.write(f'Giving up on queued email {queued.pk} to {", ".join(queued.to)}: {queued.last_error}')
+        else:
+            queued.status = 'pending'
+            queued.next_attempt_at = timezone.now() + timedelta(
+                seconds=self.retry_delay * 2 ** (queued.attempts - 1)
+            )
+        queued.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+        return queued.status == 'failed'
@@ -0,0 +1,258 @@
+"""
+Management command to reconcile StripeCustomer and Payment rows with Stripe.
+
+Subscriptions and invoices are read with Stripe's auto-paginating list APIs,
+compared against the database in memory and written back in fixed-size
+bulk_update / bulk_create batches instead of per-row saves.
+
+By default only objects created since the previous run are listed (a saved
+created[gte] cursor). Changes to older subscriptions, such as renewals or
+cancellations, are only picked up by a --full resync. Customers that a
+webhook changed while the sync was running are left alone. Payments are dated
+by their invoice, and the totals in DailyMembership and the DailyRevenue days
+of the written payments are recomputed afterwards.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+import time
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localdate
+from accounts.entitlements import invalidate_entitlements
+from accounts.models import StripeCustomer, Payment, SyncCursor
+from accounts.rollups import rebuild_membership_totals, rebuild_revenue
+from accounts.views.stripe_client import stripe
+from accounts.views.webhooks import _subscription_monthly_amount, _subscription_period_end
+
+SUBSCRIPTION_FIELDS = [
+    'stripe_subscription_id',
+    'subscription_status',
+    'subscription_plan',
+    'current_period_end',
+    'cancel_at_period_end',
+    'monthly_amount',
+]
+
+# Subscriptions that still grant access win over older, ended ones
+STATUS_PRIORITY = {'active': 2, 'trialing': 2, 'past_due': 1, 'unpaid': 1}
+
+
+class Command(BaseCommand):
+    help = 'Sync StripeCustomer and Payment records from the Stripe API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the saved cursors and list every subscription and invoice'
+        )
+        parser.add_argument(
+            '--only',
+            choices=['subscriptions', 'invoices'],
+            help='Only sync one resource type'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows per bulk_update / bulk_create statement (default: 500)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the changes without writing them or moving the cursors'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        # stripe_customer_id -> StripeCustomer, loaded once for both passes
+        self.customers = {
+            customer.stripe_customer_id: customer
+            for customer in StripeCustomer.objects.only(
+                'id', 'user_id', 'stripe_customer_id', 'last_event_created', *SUBSCRIPTION_FIELDS
+            )
+        }
+
+        if options['only'] != 'invoices':
+            self._run('subscriptions', self._sync_subscriptions, options['full'])
+        if options['only'] != 'subscriptions':
+            self._run('invoices', self._sync_invoices, options['full'])
+
+    def _run(self, name, sync, full):
+        """Run one sync pass from its saved cursor and advance the cursor."""
+        cursor, _ = SyncCursor.objects.get_or_create(name=name)
+        created_gte = 0 if full else cursor.created_gte
+
+        # Anything created while the pass runs is picked up by the next one
+        started = int(time.time())
+        list_params = {'limit': 100}
+        if created_gte:
+            list_params['created'] = {'gte': created_gte}
+
+        self.stdout.write(f'Syncing {name} created since {created_gte or "the beginning"}...')
+        sync(list_params, started)
+
+        if not self.dry_run:
+            cursor.created_gte = started
+            cursor.save()
+
+    def _sync_subscriptions(self, list_params, started):
+        # A customer can have several subscriptions - keep the one that matters
+        latest = {}
+        seen = 0
+        for subscription in stripe.Subscription.list(status='all', **list_params).auto_paging_iter():
+            seen += 1
+            # Plain dicts, as the webhook handlers get them
+            subscription = subscription.to_dict()
+            current = latest.get(subscription['customer'])
+            if current is None or self._subscription_rank(subscription) > self._subscription_rank(current):
+                latest[subscription['customer']] = subscription
+
+        changed = []
+        missing = 0
+        for customer_id, subscription in latest.items():
+            stripe_customer = self.customers.get(customer_id)
+            if stripe_customer is None:
+                missing += 1
+                continue
+
+            fields = {
+                'stripe_subscription_id': subscription['id'],
+                'subscription_status': subscription['status'],
+                'subscription_plan': subscription['items']['data'][0]['price']['id'],
+                'current_period_end': _subscription_period_end(subscription),
+                'cancel_at_period_end': subscription['cancel_at_period_end'],
+            }
+            monthly_amount = _subscription_monthly_amount(subscription)
+            if monthly_amount is not None:
+                fields['monthly_amount'] = monthly_amount
+            if subscription['status'] == 'canceled':
+                # Match the subscription.deleted webhook handler
+                fields['stripe_subscription_id'] = None
+
+            if all(getattr(stripe_customer, name) == value for name, value in fields.items()):
+                continue
+
+            for name, value in fields.items():
+                setattr(stripe_customer, name, value)
+            # The listed state is at least as new as any event created before the run
+            stripe_customer.last_event_created = started
+            stripe_customer.updated_at = datetime.now(timezone.utc)
+            changed.append(stripe_customer)
+
+        updated = len(changed)
+        if changed and not self.dry_run:
+            # The rows were loaded before the run. A webhook for an event created
+            # since then has applied newer state, so those customers are skipped
+            # rather than overwritten (or their last_event_created moved back).
+            updated = StripeCustomer.objects.filter(last_event_created__lte=started).bulk_update(
+                changed,
+                SUBSCRIPTION_FIELDS + ['last_event_created', 'updated_at'],
+                batch_size=self.batch_size,
+            )
+            invalidate_entitlements([stripe_customer.user_id for stripe_customer in changed])
+            rebuild_membership_totals()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Subscriptions: {seen} listed, {updated} customers updated, '
+            f'{len(changed) - updated} changed by webhooks during the sync, '
+            f'{missing} without a local StripeCustomer'
+        ))
+
+    def _subscription_rank(self, subscription):
+        return (STATUS_PRIORITY.get(subscription['status'], 0), subscription['created'])
+
+    def _sync_invoices(self, list_params, started):
+        batch = []
+        totals = {'listed': 0, 'created': 0, 'updated': 0, 'missing': 0}
+        # Days whose DailyRevenue rows need recomputing
+        self.revenue_dates = set()
+
+        for invoice in stripe.Invoice.list(**list_params).auto_paging_iter():
+            totals['listed'] += 1
+            payment = self._invoice_payment(invoice.to_dict())
+            if payment is None:
+                continue
+            if payment is False:
+                totals['missing'] += 1
+                continue
+
+            batch.append(payment)
+            if len(batch) >= self.batch_size:
+                self._apply_payments(batch, totals)
+                batch = []
+
+        if batch:
+            self._apply_payments(batch, totals)
+
+        if self.revenue_dates and not self.dry_run:
+            rebuild_revenue(self.revenue_dates)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Invoices: {totals['listed']} listed, {totals['created']} payments created, "
+            f"{totals['updated']} updated, {totals['missing']} without a local StripeCustomer"
+        ))
+
+    def _invoice_payment(self, invoice):
+        """
+        Build an unsaved Payment for an invoice.
+
+        Returns None for invoices that are not payments (drafts, voided or not yet
+        attempted) and False if the customer is unknown.
+        """
+        if invoice['status'] == 'paid':
+            status, amount = 'succeeded', invoice['amount_paid']
+        elif invoice['status'] in ('open', 'uncollectible') and invoice.get('attempted'):
+            status, amount = 'failed', invoice['amount_due']
+        else:
+            return None
+
+        stripe_customer = self.customers.get(invoice['customer'])
+        if stripe_customer is None:
+            return False
+
+        # Date the payment when it was paid (or the invoice was created), not
+        # when it was synced, so backfilled history lands on the right days
+        paid_at = (invoice.get('status_transitions') or {}).get('paid_at') if status == 'succeeded' else None
+
+        # Same mapping as the invoice webhook handlers
+        return Payment(
+            user_id=stripe_customer.user_id,
+            stripe_payment_id=invoice['id'],
+            amount=Decimal(amount) / 100,
+            currency=invoice['currency'],
+            status=status,
+            payment_type='subscription' if invoice.get('subscription') else 'one_time',
+            description=invoice.get('description', ''),
+            invoice_url=invoice.get('hosted_invoice_url', ''),
+            created_at=datetime.fromtimestamp(paid_at or invoice['created'], timezone.utc),
+        )
+
+    def _apply_payments(self, payments, totals):
+        """Insert new payments and update changed ones for one batch."""
+        existing = Payment.objects.only('id', 'stripe_payment_id', 'status', 'amount', 'created_at').in_bulk(
+            [payment.stripe_payment_id for payment in payments],
+            field_name='stripe_payment_id',
+        )
+
+        new, changed = [], []
+        for payment in payments:
+            current = existing.get(payment.stripe_payment_id)
+            if current is None:
+                new.append(payment)
+            elif (current.status, current.amount) != (payment.status, payment.amount):
+                current.status = payment.status
+                current.amount = payment.amount
+                changed.append(current)
+                self.revenue_dates.add(localdate(current.created_at))
+
+        if not self.dry_run:
+            if new:
+                Payment.objects.bulk_create(new, ignore_conflicts=True, batch_size=self.batch_size)
+                self.revenue_dates.update(localdate(payment.created_at) for payment in new)
+            if changed:
+                Payment.objects.bulk_update(changed, ['status', 'amount'], batch_size=self.batch_size)
+
+        totals['created'] += len(new)
+        totals['updated'] += len(changed)
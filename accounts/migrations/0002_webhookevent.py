@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_event_id', models.CharField(db_index=True, help_text='Stripe event ID', max_length=255)),
+                ('event_type', models.CharField(help_text='Stripe event type (e.g., invoice.payment_succeeded)', max_length=100)),
+                ('stripe_customer_id', models.CharField(blank=True, db_index=True, help_text='Stripe customer ID the event belongs to, used to keep per-customer ordering', max_length=255, null=True)),
+                ('payload', models.JSONField(help_text='Raw verified event payload')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('next_attempt_at', models.DateTimeField(blank=True, help_text='Earliest time process_webhooks retries a failed event, empty to run it right away', null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='webhook_status_id_idx')],
+            },
+        ),
+    ]
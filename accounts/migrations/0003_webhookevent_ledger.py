@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='duration_ms',
+            field=models.FloatField(blank=True, help_text='Handler processing time of the last attempt in milliseconds', null=True),
+        ),
+        migrations.AlterField(
+            model_name='webhookevent',
+            name='stripe_event_id',
+            field=models.CharField(help_text='Stripe event ID', max_length=255, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_webhookevent_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripecustomer',
+            name='last_event_created',
+            field=models.BigIntegerField(default=0, help_text='Creation time (Unix timestamp) of the newest Stripe event applied'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_stripecustomer_last_event_created'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='SyncCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the synced Stripe resource (e.g., subscriptions)', max_length=100, unique=True)),
+                ('created_gte', models.BigIntegerField(default=0, help_text='Unix timestamp the next run lists Stripe objects from')),
+                ('last_run_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sync Cursor',
+                'verbose_name_plural': 'Sync Cursors',
+            },
+        ),
+    ]
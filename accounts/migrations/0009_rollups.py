@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_queuedemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_members', models.PositiveIntegerField(default=0)),
+                ('churned_members', models.PositiveIntegerField(default=0)),
+                ('active_members', models.IntegerField(default=0, help_text='Members that are active or trialing')),
+                ('past_due_members', models.IntegerField(default=0)),
+                ('mrr', models.DecimalField(decimal_places=2, default=0, help_text='Monthly recurring revenue of active, trialing and past due members', max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Daily Membership',
+                'verbose_name_plural': 'Daily Membership',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='stripecustomer',
+            name='monthly_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Subscription price per month, counted in MRR', max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('payment_type', models.CharField(max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, help_text='Total of succeeded payments', max_digits=12)),
+                ('payments', models.PositiveIntegerField(default=0, help_text='Number of succeeded payments')),
+                ('failed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('failed_payments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Revenue',
+                'verbose_name_plural': 'Daily Revenue',
+                'ordering': ['-date', 'currency', 'payment_type'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'currency', 'payment_type'), name='dailyrevenue_date_currency_type_uniq')],
+            },
+        ),
+    ]
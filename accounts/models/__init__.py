@@ -4,5 +4,9 @@ Re-exports all models to maintain backwards compatibility.
 """
 from .user import User, UserManager
 from .payment import StripeCustomer, Payment
+from .webhook import WebhookEvent
+from .sync import SyncCursor
+from .email import QueuedEmail
+from .rollup import DailyRevenue, DailyMembership
 
-__all__ = ['User', 'UserManager', 'StripeCustomer', 'Payment']
+__all__ = ['User', 'UserManager', 'StripeCustomer', 'Payment', 'WebhookEvent', 'SyncCursor', 'QueuedEmail', 'DailyRevenue', 'DailyMembership']
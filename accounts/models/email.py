@@ -0,0 +1,109 @@
+import base64
+from django.core.mail import EmailMultiAlternatives
+from django.db import models
+
+
+class QueuedEmail(models.Model):
+    """
+    Outgoing email waiting to be delivered by `manage.py send_queued_email`.
+
+    QueuedEmailBackend writes messages here so requests never wait on the mail
+    server. Sent messages are deleted by the worker after --keep-sent hours.
+    Messages that keep failing end up as failed, where they stay for
+    inspection and can be retried from the admin.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField()
+    content_subtype = models.CharField(max_length=20, default='plain')
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list)
+    bcc = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list)
+    headers = models.JSONField(default=dict)
+    alternatives = models.JSONField(
+        default=list,
+        help_text='[content, mimetype] pairs, e.g. the HTML version'
+    )
+    attachments = models.JSONField(
+        default=list,
+        help_text='[filename, base64 content, mimetype] triples'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='Earliest time of the next delivery attempt, empty to send right away'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Queued Email'
+        verbose_name_plural = 'Queued Emails'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='queuedemail_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} - {', '.join(self.to)} ({self.status})"
+
+    @classmethod
+    def from_message(cls, message):
+        """Build an unsaved row from an EmailMessage."""
+        attachments = []
+        for attachment in message.attachments:
+            if not isinstance(attachment, tuple):
+                raise ValueError('Only (filename, content, mimetype) attachments can be queued')
+            filename, content, mimetype = attachment
+            if isinstance(content, str):
+                content = content.encode()
+            attachments.append([filename, base64.b64encode(content).decode('ascii'), mimetype])
+
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            content_subtype=message.content_subtype,
+            from_email=message.from_email,
+            to=list(message.to),
+            cc=list(message.cc),
+            bcc=list(message.bcc),
+            reply_to=list(message.reply_to),
+            headers=dict(message.extra_headers),
+            alternatives=[list(alternative) for alternative in getattr(message, 'alternatives', [])],
+            attachments=attachments,
+        )
+
+    def to_message(self, connection=None):
+        """Rebuild the EmailMessage to send over `connection`."""
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            cc=self.cc,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+            headers=self.headers,
+            alternatives=[tuple(alternative) for alternative in self.alternatives],
+            connection=connection,
+        )
+        message.content_subtype = self.content_subtype
+        for filename, content, mimetype in self.attachments:
+            message.attach(filename, base64.b64decode(content), mimetype)
+        return message
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from .user import User
 
@@ -15,6 +16,11 @@ class StripeCustomer(models.Model):
         ('unpaid', 'Unpaid'),
     ]
 
+    # Statuses that grant gym access
+    ACTIVE_STATUSES = ('active', 'trialing')
+    # Statuses of a subscription that is still billed, counted as members in MRR
+    MEMBER_STATUSES = ('active', 'trialing', 'past_due')
+
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
@@ -48,16 +54,34 @@ class StripeCustomer(models.Model):
         null=True,
         help_text='Current subscription period end date'
     )
+    monthly_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        help_text='Subscription price per month, counted in MRR'
+    )
     cancel_at_period_end = models.BooleanField(
         default=False,
         help_text='Whether the subscription will cancel at period end'
     )
+    last_event_created = models.BigIntegerField(
+        default=0,
+        help_text='Creation time (Unix timestamp) of the newest Stripe event applied'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Stripe Customer'
         verbose_name_plural = 'Stripe Customers'
+        indexes = [
+            # Members by status, e.g. active members whose period is ending
+            models.Index(
+                fields=['subscription_status', 'current_period_end'],
+                name='customer_status_period_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.stripe_customer_id}"
@@ -65,7 +89,7 @@ class StripeCustomer(models.Model):
     @property
     def has_active_subscription(self):
         """Check if the customer has an active subscription."""
-        return self.subscription_status in ['active', 'trialing']
+        return self.subscription_status in self.ACTIVE_STATUSES
 
 
 class Payment(models.Model):
@@ -123,12 +147,23 @@ class Payment(models.Model):
         null=True,
         help_text='Stripe invoice URL'
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so payments backfilled by sync_stripe keep their Stripe date
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a member's billing history
+            models.Index(fields=['user', 'created_at', 'id'], name='payment_user_created_id_idx'),
+            # Admin changelist: list_filter fields, ordered by -created_at
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+            models.Index(fields=['payment_type', 'created_at'], name='payment_type_created_idx'),
+            models.Index(fields=['currency', 'created_at'], name='payment_currency_created_idx'),
+            # Admin date_hierarchy and default ordering
+            models.Index(fields=['created_at'], name='payment_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - ${self.amount} ({self.status})"
@@ -0,0 +1,62 @@
+from django.db import models
+
+
+class DailyRevenue(models.Model):
+    """Payment totals for one day, currency and payment type."""
+
+    date = models.DateField()
+    currency = models.CharField(max_length=3)
+    payment_type = models.CharField(max_length=20)
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text='Total of succeeded payments'
+    )
+    payments = models.PositiveIntegerField(default=0, help_text='Number of succeeded payments')
+    failed_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    failed_payments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Daily Revenue'
+        verbose_name_plural = 'Daily Revenue'
+        ordering = ['-date', 'currency', 'payment_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'currency', 'payment_type'],
+                name='dailyrevenue_date_currency_type_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.currency} {self.payment_type}: {self.amount}"
+
+
+class DailyMembership(models.Model):
+    """
+    Membership changes during one day, and the totals at its end.
+
+    new_members and churned_members count the status changes applied that
+    day. The other fields are totals carried over from the previous row and
+    kept up to date as members change, so the latest row is the current state.
+    """
+
+    date = models.DateField(unique=True)
+    new_members = models.PositiveIntegerField(default=0)
+    churned_members = models.PositiveIntegerField(default=0)
+    active_members = models.IntegerField(default=0, help_text='Members that are active or trialing')
+    past_due_members = models.IntegerField(default=0)
+    mrr = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text='Monthly recurring revenue of active, trialing and past due members'
+    )
+
+    class Meta:
+        verbose_name = 'Daily Membership'
+        verbose_name_plural = 'Daily Membership'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.active_members} active, MRR {self.mrr}"
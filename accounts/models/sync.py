@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class SyncCursor(models.Model):
+    """Position of an incremental Stripe sync, saved between runs."""
+
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text='Name of the synced Stripe resource (e.g., subscriptions)'
+    )
+    created_gte = models.BigIntegerField(
+        default=0,
+        help_text='Unix timestamp the next run lists Stripe objects from'
+    )
+    last_run_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Sync Cursor'
+        verbose_name_plural = 'Sync Cursors'
+
+    def __str__(self):
+        return f"{self.name} - {self.created_gte}"
@@ -0,0 +1,73 @@
+from django.db import models
+
+
+class WebhookEvent(models.Model):
+    """
+    Ledger of verified Stripe webhook events.
+
+    Every delivery is recorded once per Stripe event ID, which makes redeliveries
+    cheap to skip and lets events be replayed from the database. When the webhook
+    queue is enabled the same table doubles as the processing queue.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    stripe_event_id = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text='Stripe event ID'
+    )
+    event_type = models.CharField(
+        max_length=100,
+        help_text='Stripe event type (e.g., invoice.payment_succeeded)'
+    )
+    stripe_customer_id = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text='Stripe customer ID the event belongs to, used to keep per-customer ordering'
+    )
+    payload = models.JSONField(help_text='Raw verified event payload')
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    next_attempt_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text='Earliest time process_webhooks retries a failed event, empty to run it right away'
+    )
+    duration_ms = models.FloatField(
+        blank=True,
+        null=True,
+        help_text='Handler processing time of the last attempt in milliseconds'
+    )
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Webhook Event'
+        verbose_name_plural = 'Webhook Events'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} - {self.stripe_event_id} ({self.status})"
+
+    @property
+    def latency(self):
+        """Time from receiving the event to finishing processing it."""
+        if self.processed_at:
+            return self.processed_at - self.received_at
+        return None
@@ -0,0 +1,61 @@
+"""
+Stripe customer provisioning.
+
+Stripe customers are created ahead of checkout by the provision_stripe_customers
+command, which with --loop picks up every user shortly after they confirm their
+email, so the "Start Membership" click does not pay for an extra Stripe
+round-trip. The ensure_* helpers remain as a race-safe fallback for users
+without a customer.
+"""
+from django.db import IntegrityError, transaction
+from .models import StripeCustomer
+from .views.stripe_client import stripe, logger
+
+
+def stripe_customer_params(user):
+    """Return the stripe.Customer.create arguments for a user."""
+    # The idempotency key makes concurrent creates for a user return the same
+    # Stripe customer, so the provisioning worker and checkout can safely race
+    return {
+        'email': user.email,
+        'name': user.get_full_name(),
+        'metadata': {'user_id': user.pk},
+        'idempotency_key': f'customer-create-{user.pk}-{user.email}',
+    }
+
+
+def _save_stripe_customer(user, customer_id):
+    """Store the customer, returning the existing row if another process won the race."""
+    try:
+        with transaction.atomic():
+            return StripeCustomer.objects.create(user=user, stripe_customer_id=customer_id)
+    except IntegrityError:
+        return StripeCustomer.objects.get(user=user)
+
+
+def ensure_stripe_customer(user):
+    """Return the user's StripeCustomer, creating the Stripe customer if needed."""
+    try:
+        return StripeCustomer.objects.get(user=user)
+    except StripeCustomer.DoesNotExist:
+        pass
+
+    customer = stripe.Customer.create(**stripe_customer_params(user))
+    logger.info(f"Created Stripe customer {customer.id} for user {user.pk}")
+    return _save_stripe_customer(user, customer.id)
+
+
+async def aensure_stripe_customer(user):
+    """Async version of ensure_stripe_customer for async views."""
+    try:
+        return await StripeCustomer.objects.aget(user=user)
+    except StripeCustomer.DoesNotExist:
+        pass
+
+    customer = await stripe.Customer.create_async(**stripe_customer_params(user))
+    logger.info(f"Created Stripe customer {customer.id} for user {user.pk}")
+    try:
+        return await StripeCustomer.objects.acreate(user=user, stripe_customer_id=customer.id)
+    except IntegrityError:
+        return await StripeCustomer.objects.aget(user=user)
+
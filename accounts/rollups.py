@@ -0,0 +1,213 @@
+"""
+Daily revenue and membership rollups.
+
+The admin dashboard reads DailyRevenue and DailyMembership instead of
+aggregating Payment and StripeCustomer, so it costs the same however long the
+payment history gets. The webhook handlers keep the rollups current through
+record_payment() and record_membership_change(). The rebuild_* functions (and
+`manage.py rebuild_rollups`) recompute them from the source tables.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailyMembership, DailyRevenue, Payment, StripeCustomer
+
+# DailyMembership fields that are running totals rather than per-day counts
+TOTAL_FIELDS = ('active_members', 'past_due_members', 'mrr')
+
+
+def _increment(model, keys, initial, **deltas):
+    """
+    Add `deltas` to the row matching `keys` with a single UPDATE.
+
+    A missing row is created from initial() plus the deltas; initial is only
+    called in that case.
+    """
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**keys).update(**increments):
+        return
+
+    values = initial()
+    for field, value in deltas.items():
+        values[field] = values.get(field, 0) + value
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **values)
+            return
+    except IntegrityError:
+        # Another process created the row first
+        pass
+    model.objects.filter(**keys).update(**increments)
+
+
+def record_payment(payment):
+    """Add a newly created Payment to its day's revenue."""
+    if payment.status == 'succeeded':
+        deltas = {'amount': payment.amount, 'payments': 1}
+    elif payment.status == 'failed':
+        deltas = {'failed_amount': payment.amount, 'failed_payments': 1}
+    else:
+        return
+
+    _increment(
+        DailyRevenue,
+        {
+            'date': timezone.localdate(payment.created_at),
+            'currency': payment.currency,
+            'payment_type': payment.payment_type,
+        },
+        dict,
+        **deltas
+    )
+
+
+def _member_totals(status, monthly_amount):
+    """What one customer adds to each of the TOTAL_FIELDS."""
+    return {
+        'active_members': int(status in StripeCustomer.ACTIVE_STATUSES),
+        'past_due_members': int(status == 'past_due'),
+        'mrr': (monthly_amount or Decimal('0')) if status in StripeCustomer.MEMBER_STATUSES else Decimal('0'),
+    }
+
+
+def _current_totals():
+    """The TOTAL_FIELDS computed from StripeCustomer."""
+    return StripeCustomer.objects.aggregate(
+        active_members=Count('id', filter=Q(subscription_status__in=StripeCustomer.ACTIVE_STATUSES)),
+        past_due_members=Count('id', filter=Q(subscription_status='past_due')),
+        mrr=Sum(
+            'monthly_amount',
+            filter=Q(subscription_status__in=StripeCustomer.MEMBER_STATUSES),
+            default=Decimal('0'),
+        ),
+    )
+
+
+def _opening_totals(before, deltas):
+    """
+    The totals a new DailyMembership row for `before` starts from.
+
+    They carry over from the newest earlier row. Before the first row exists
+    they are taken from StripeCustomer, which already includes the change
+    being recorded, so its deltas are taken back out.
+    """
+    latest = DailyMembership.objects.filter(date__lt=before).order_by('-date').values(*TOTAL_FIELDS).first()
+    if latest is not None:
+        return latest
+    totals = _current_totals()
+    return {field: totals[field] - deltas.get(field, 0) for field in TOTAL_FIELDS}
+
+
+def record_membership_change(old_status, old_amount, new_status, new_amount):
+    """Apply a customer's change of status or monthly amount to today's membership row."""
+    before = _member_totals(old_status, old_amount)
+    after = _member_totals(new_status, new_amount)
+    deltas = {field: after[field] - before[field] for field in TOTAL_FIELDS if after[field] != before[field]}
+
+    was_member = old_status in StripeCustomer.MEMBER_STATUSES
+    is_member = new_status in StripeCustomer.MEMBER_STATUSES
+    if is_member and not was_member:
+        deltas['new_members'] = 1
+    elif was_member and not is_member:
+        deltas['churned_members'] = 1
+
+    if not deltas:
+        return
+
+    today = timezone.localdate()
+    _increment(DailyMembership, {'date': today}, lambda: _opening_totals(today, deltas), **deltas)
+
+
+def rebuild_revenue(dates=None, since=None):
+    """Recompute DailyRevenue from Payment, for every day, the given dates or the days since a date."""
+    payments = Payment.objects.all()
+    rows = DailyRevenue.objects.all()
+    if dates is not None:
+        payments = payments.filter(created_at__date__in=dates)
+        rows = rows.filter(date__in=dates)
+    if since is not None:
+        payments = payments.filter(created_at__date__gte=since)
+        rows = rows.filter(date__gte=since)
+
+    totals = (
+        payments
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'currency', 'payment_type')
+        .annotate(
+            succeeded_amount=Sum('amount', filter=Q(status='succeeded'), default=Decimal('0')),
+            succeeded_count=Count('id', filter=Q(status='succeeded')),
+            failed_total=Sum('amount', filter=Q(status='failed'), default=Decimal('0')),
+            failed_count=Count('id', filter=Q(status='failed')),
+        )
+        .order_by()
+    )
+
+    with transaction.atomic():
+        rows.delete()
+        created = DailyRevenue.objects.bulk_create(
+            [
+                DailyRevenue(
+                    date=total['day'],
+                    currency=total['currency'],
+                    payment_type=total['payment_type'],
+                    amount=total['succeeded_amount'],
+                    payments=total['succeeded_count'],
+                    failed_amount=total['failed_total'],
+                    failed_payments=total['failed_count'],
+                )
+                for total in totals
+            ],
+            batch_size=500,
+        )
+    return len(created)
+
+
+def rebuild_membership_totals():
+    """
+    Recompute today's active, past due and MRR totals from StripeCustomer.
+
+    The new and churned counts are only known from the status changes the
+    webhook handlers saw, so they are left as they are.
+    """
+    totals = _current_totals()
+    DailyMembership.objects.update_or_create(date=timezone.localdate(), defaults=totals)
+    return totals
+
+
+def dashboard(days=30):
+    """
+    Read everything the admin dashboard shows for the last `days` days.
+
+    Every query reads at most one row per day (per currency and payment type
+    for revenue), however many payments and members there are.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+
+    revenue = {}
+    for row in DailyRevenue.objects.filter(date__gte=since):
+        total = revenue.setdefault((row.currency, row.payment_type), {
+            'currency': row.currency,
+            'payment_type': row.payment_type,
+            'amount': Decimal('0'),
+            'payments': 0,
+            'failed_amount': Decimal('0'),
+            'failed_payments': 0,
+        })
+        total['amount'] += row.amount
+        total['payments'] += row.payments
+        total['failed_amount'] += row.failed_amount
+        total['failed_payments'] += row.failed_payments
+
+    membership = list(DailyMembership.objects.filter(date__gte=since))
+    return {
+        'days': days,
+        'since': since,
+        'revenue': sorted(revenue.values(), key=lambda total: (total['currency'], total['payment_type'])),
+        'membership': membership,
+        'current': membership[0] if membership else DailyMembership.objects.order_by('-date').first(),
+        'new_members': sum(row.new_members for row in membership),
+        'churned_members': sum(row.churned_members for row in membership),
+    }
@@ -0,0 +1,97 @@
+"""
+Fixture generator for load tests and benchmarks.
+
+Seeded users get addresses at LOADTEST_EMAIL_DOMAIN and Stripe customer IDs
+from customer_id(), so they can be found again and removed with
+delete_seeded() without touching real members.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from .models import Payment, StripeCustomer, User, WebhookEvent
+
+LOADTEST_EMAIL_DOMAIN = 'loadtest.invalid'
+CUSTOMER_PREFIX = 'cus_loadtest'
+BATCH_SIZE = 500
+
+
+def customer_id(index):
+    return f'{CUSTOMER_PREFIX}{index:06d}'
+
+
+def seed_customers(count):
+    """
+    Create `count` users with StripeCustomer rows, reusing any that exist.
+
+    Returns their Stripe customer IDs.
+    """
+    emails = {customer_id(index): f'loadtest{index:06d}@{LOADTEST_EMAIL_DOMAIN}' for index in range(count)}
+    # Unusable password, so seeding skips password hashing
+    password = make_password(None)
+    User.objects.bulk_create(
+        [
+            User(email=email, first_name='Load', last_name=f'Test {index}', password=password)
+            for index, email in enumerate(emails.values())
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    user_ids = dict(User.objects.filter(email__endswith=f'@{LOADTEST_EMAIL_DOMAIN}').values_list('email', 'id'))
+    StripeCustomer.objects.bulk_create(
+        [
+            StripeCustomer(user_id=user_ids[email], stripe_customer_id=stripe_id)
+            for stripe_id, email in emails.items()
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return list(emails)
+
+
+def seed_members(count, payments_per_member):
+    """
+    Create `count` active members with `payments_per_member` payments each.
+
+    Builds on seed_customers(); returns the Stripe customer IDs.
+    """
+    customer_ids = seed_customers(count)
+    StripeCustomer.objects.filter(stripe_customer_id__in=customer_ids).update(
+        # e.g. "sub_cus_loadtest000001", which the fake Stripe API accepts
+        stripe_subscription_id=Concat(Value('sub_'), 'stripe_customer_id'),
+        subscription_status='active',
+        subscription_plan='price_loadtest',
+        monthly_amount=Decimal('70.00'),
+        current_period_end=timezone.now() + timedelta(days=30),
+    )
+
+    user_ids = StripeCustomer.objects.filter(stripe_customer_id__in=customer_ids).values_list('user_id', flat=True)
+    Payment.objects.bulk_create(
+        (
+            Payment(
+                user_id=user_id,
+                stripe_payment_id=f'in_loadtest{user_id:07d}{number:05d}',
+                amount=Decimal('70.00'),
+                currency='usd',
+                # One in twenty fails, so status filters have something to find
+                status='failed' if number % 20 == 19 else 'succeeded',
+                payment_type='subscription',
+                description='Monthly membership',
+            )
+            for user_id in user_ids
+            for number in range(payments_per_member)
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return customer_ids
+
+
+def delete_seeded():
+    """Delete every seeded user with their customers, payments and webhook events."""
+    WebhookEvent.objects.filter(stripe_customer_id__startswith=CUSTOMER_PREFIX).delete()
+    deleted, _ = User.objects.filter(email__endswith=f'@{LOADTEST_EMAIL_DOMAIN}').delete()
+    return deleted
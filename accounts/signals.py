@@ -0,0 +1,20 @@
+"""Signal receivers for the accounts app."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .auth import invalidate_cached_user
+from .entitlements import invalidate_entitlements
+from .models import StripeCustomer, User
+
+
+@receiver(post_save, sender=StripeCustomer)
+@receiver(post_delete, sender=StripeCustomer)
+def invalidate_entitlement_on_write(sender, instance, **kwargs):
+    """Drop the cached entitlement when a StripeCustomer is saved through the ORM."""
+    invalidate_entitlements([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_on_write(sender, instance, **kwargs):
+    """Drop the cached request.user when a User is saved through the ORM."""
+    invalidate_cached_user(instance.pk)
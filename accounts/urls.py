@@ -9,6 +9,7 @@ urlpatterns = [
 
     # Billing and payments
     path('billing/', views.billing, name='billing'),
+    path('billing/payments/', views.billing_payments, name='billing_payments'),
 
     # Settings
     path('settings/', views.settings, name='settings'),
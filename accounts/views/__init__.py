@@ -3,7 +3,7 @@ Accounts views package.
 Re-exports all views to maintain backwards compatibility with urls.py.
 """
 # Account views
-from .account import dashboard, billing, settings
+from .account import dashboard, billing, billing_payments, settings
 
 # Checkout views
 from .checkout import (
@@ -23,6 +23,7 @@ __all__ = [
     # Account
     'dashboard',
     'billing',
+    'billing_payments',
     'settings',
     # Checkout
     'create_checkout_session',
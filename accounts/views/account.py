@@ -1,36 +1,76 @@
 """Account management views: dashboard, billing, settings."""
+from datetime import datetime
+from django.db.models import Q
+from django.http import HttpResponseBadRequest
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from ..models import StripeCustomer
+from core.db_router import read_from_replica
+from ..entitlements import get_entitlement
+from ..models import Payment, StripeCustomer
 from ..forms import UpdateProfileForm
 
+# Payments shown per page of billing history
+PAYMENTS_PAGE_SIZE = 20
+
 
 @login_required
+@read_from_replica
 def dashboard(request):
     """Account dashboard view."""
-    user = request.user
-    stripe_customer = None
-    has_subscription = False
-
-    try:
-        stripe_customer = user.stripe_customer
-        has_subscription = stripe_customer.has_active_subscription
-    except StripeCustomer.DoesNotExist:
-        pass
+    membership = get_entitlement(request.user.pk)
 
     context = {
-        'stripe_customer': stripe_customer,
-        'has_subscription': has_subscription,
+        'membership': membership,
+        'has_subscription': membership.is_active,
     }
     return render(request, 'accounts/dashboard.html', context)
 
 
+def _encode_cursor(payment):
+    return f"{payment.created_at.isoformat()}_{payment.pk}"
+
+
+def _decode_cursor(cursor):
+    created_at, pk = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(created_at), int(pk)
+
+
+def _payments_after(user, cursor=None):
+    """A user's payments, newest first, starting after the (created_at, id) cursor."""
+    payments = Payment.objects.filter(user=user).order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = cursor
+        # The redundant created_at__lte gives the index a range to seek to;
+        # the OR alone makes the database scan all newer rows and filter them
+        payments = payments.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+            created_at__lte=created_at,
+        )
+    return payments
+
+
+def _payments_page(user, cursor=None):
+    """
+    Return one page of a user's payments, newest first, and the cursor of the next page.
+
+    Uses keyset pagination on (created_at, id), backed by the
+    (user, created_at, id) index, so every page costs the same as the first.
+    """
+    payments = _payments_after(user, cursor)
+
+    # Fetch one extra row to know whether there is a next page
+    page = list(payments[:PAYMENTS_PAGE_SIZE + 1])
+    next_cursor = _encode_cursor(page[PAYMENTS_PAGE_SIZE - 1]) if len(page) > PAYMENTS_PAGE_SIZE else None
+    return page[:PAYMENTS_PAGE_SIZE], next_cursor
+
+
 @login_required
+@read_from_replica
 def billing(request):
     """Billing and payment history view."""
     user = request.user
-    payments = user.payments.all()[:20]  # Last 20 payments
+    payments, next_cursor = _payments_page(user)
 
     try:
         stripe_customer = user.stripe_customer
@@ -39,11 +79,28 @@ def billing(request):
 
     context = {
         'payments': payments,
+        'next_cursor': next_cursor,
         'stripe_customer': stripe_customer,
     }
     return render(request, 'accounts/billing.html', context)
 
 
+@login_required
+@read_from_replica
+def billing_payments(request):
+    """HTML fragment with the next page of payment history rows."""
+    try:
+        cursor = _decode_cursor(request.GET['cursor'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Invalid cursor')
+
+    payments, next_cursor = _payments_page(request.user, cursor)
+    response = render(request, 'accounts/partials/payment_rows.html', {'payments': payments})
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
+
 @login_required
 def settings(request):
     """Account settings view."""
@@ -1,62 +1,53 @@
-"""Stripe checkout session and payment flow views."""
+"""
+Stripe checkout session and payment flow views.
+
+The views that call Stripe are async so that, under ASGI, a worker can keep
+many Stripe requests in flight instead of blocking a thread on each one.
+"""
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_POST
+import time
+from core.db_router import pin_to_primary
+from core.metrics import CHECKOUT_SESSION_SECONDS
 from .stripe_client import stripe
 from ..models import StripeCustomer
+from .. import provisioning
 
 
 @login_required
 @require_POST
-def create_checkout_session(request):
+async def create_checkout_session(request):
     """Create a Stripe checkout session for subscription or one-time payment."""
+    user = await request.auser()
     try:
-        # Get or create Stripe customer
-        stripe_customer = None
-        try:
-            stripe_customer = request.user.stripe_customer
-            customer_id = stripe_customer.stripe_customer_id
-        except StripeCustomer.DoesNotExist:
-            # Create new Stripe customer
-            customer = stripe.Customer.create(
-                email=request.user.email,
-                name=request.user.get_full_name(),
-            )
-            customer_id = customer.id
-            # Save to database
-            stripe_customer = StripeCustomer.objects.create(
-                user=request.user,
-                stripe_customer_id=customer_id
-            )
+        # Customers are normally provisioned after email confirmation; this is the fallback
+        stripe_customer = await provisioning.aensure_stripe_customer(user)
+        customer_id = stripe_customer.stripe_customer_id
 
         # Get price ID from request (you'll need to create products/prices in Stripe dashboard)
         price_id = 'price_1STl45Ru9ccavkk7c9LOo0rd'  # e.g., 'price_xxx' from Stripe
         payment_type = request.POST.get('payment_type', 'subscription')  # 'subscription' or 'payment'
 
         # Create checkout session
-        if payment_type == 'subscription':
-            checkout_session = stripe.checkout.Session.create(
-                customer=customer_id,
-                line_items=[{
-                    'price': price_id,
-                    'quantity': 1,
-                }],
-                mode='subscription',
-                success_url=request.build_absolute_uri('/account/checkout/success/'),
-                cancel_url=request.build_absolute_uri('/account/checkout/cancel/'),
-            )
-        else:
-            checkout_session = stripe.checkout.Session.create(
+        mode = 'subscription' if payment_type == 'subscription' else 'payment'
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            checkout_session = await stripe.checkout.Session.create_async(
                 customer=customer_id,
                 line_items=[{
                     'price': price_id,
                     'quantity': 1,
                 }],
-                mode='payment',
+                mode=mode,
                 success_url=request.build_absolute_uri('/account/checkout/success/'),
                 cancel_url=request.build_absolute_uri('/account/checkout/cancel/'),
             )
+            outcome = 'success'
+        finally:
+            CHECKOUT_SESSION_SECONDS.labels(mode, outcome).observe(time.perf_counter() - started)
 
         return redirect(checkout_session.url)
 
@@ -66,6 +57,7 @@ def create_checkout_session(request):
 
 
 @login_required
+@pin_to_primary
 def checkout_success(request):
     """Checkout success page."""
     messages.success(request, 'Payment successful! Thank you for your purchase.')
@@ -80,11 +72,12 @@ def checkout_cancel(request):
 
 
 @login_required
-def create_customer_portal_session(request):
+async def create_customer_portal_session(request):
     """Create a Stripe customer portal session."""
+    user = await request.auser()
     try:
-        stripe_customer = request.user.stripe_customer
-        portal_session = stripe.billing_portal.Session.create(
+        stripe_customer = await StripeCustomer.objects.aget(user=user)
+        portal_session = await stripe.billing_portal.Session.create_async(
             customer=stripe_customer.stripe_customer_id,
             return_url=request.build_absolute_uri('/account/settings/'),
         )
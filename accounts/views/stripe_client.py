@@ -1,13 +1,164 @@
-"""Stripe API client initialization and shared utilities."""
+"""
+Stripe API client initialization and shared utilities.
+
+All Stripe calls go through one shared HTTP client. It keeps a keep-alive
+connection pool so requests reuse TLS connections, uses bounded connect/read
+timeouts, and reports every call's endpoint and duration to the registered
+latency hooks (core.metrics feeds them to Prometheus). Retries are left to the Stripe SDK:
+with max_network_retries set, every POST carries an idempotency key that is
+reused across attempts, and failures are retried with jittered exponential
+backoff (honoring Stripe-Should-Retry).
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+import weakref
 from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
 import stripe
-import logging
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# Path segments that are Stripe object IDs (cus_..., sub_..., cs_test_...)
+_OBJECT_ID_RE = re.compile(r'^[a-z]+(_test|_live)?_[A-Za-z0-9]{8,}$')
+
+_latency_hooks = []
+
+
+def register_latency_hook(hook):
+    """
+    Register a callable run after every Stripe API call.
+
+    The hook is called as hook(endpoint, duration_ms, status_code), where
+    endpoint looks like "POST /v1/customers" and status_code is None if the
+    request failed before a response arrived.
+    """
+    if hook not in _latency_hooks:
+        _latency_hooks.append(hook)
+
+
+def endpoint_name(method, url):
+    """Normalize a Stripe request to "METHOD /v1/path/{id}" for aggregation."""
+    path = url.split('://', 1)[-1].split('?', 1)[0]
+    path = '/' + path.split('/', 1)[1] if '/' in path else '/'
+    segments = ['{id}' if _OBJECT_ID_RE.match(segment) else segment for segment in path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def _record_latency(method, url, duration_ms, status_code):
+    endpoint = endpoint_name(method, url)
+    for hook in _latency_hooks:
+        try:
+            hook(endpoint, duration_ms, status_code)
+        except Exception as e:
+            logger.error(f"Stripe latency hook {hook!r} failed: {str(e)}")
+
+
+class InstrumentedRequestsClient(stripe.RequestsClient):
+    """
+    Requests-based Stripe HTTP client that reports per-endpoint latency.
+
+    Async calls (the *_async SDK methods) go through httpx. An httpx connection
+    pool belongs to the event loop it was opened on, so one async client is kept
+    per loop registered by with_async_pool (the ASGI server's). Any other loop,
+    such as the one async_to_sync opens for each async view under WSGI, is
+    closed after a single call or request. A client per such loop would pay for
+    a TLS handshake every time and leak its sockets, so those calls use the
+    pooled sync session instead; the loop serves only that one call, so
+    blocking it costs nothing.
+    """
+
+    def __init__(self, *args, async_timeout=80, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_timeout = async_timeout
+        # loop -> its httpx client, dropped along with the loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._async_clients_lock:
+                client = self._async_clients.setdefault(loop, stripe.HTTPXClient(timeout=self._async_timeout))
+        return client
+
+    def request(self, method, url, headers, post_data=None):
+        started = time.perf_counter()
+        status_code = None
+        try:
+            content, status_code, response_headers = super().request(method, url, headers, post_data)
+            return content, status_code, response_headers
+        finally:
+            _record_latency(method, url, (time.perf_counter() - started) * 1000, status_code)
+
+    async def request_async(self, method, url, headers, post_data=None):
+        if asyncio.get_running_loop() not in _pooled_loops:
+            return self.request(method, url, headers, post_data)
+
+        started = time.perf_counter()
+        status_code = None
+        try:
+            content, status_code, response_headers = await self._async_client().request_async(
+                method, url, headers, post_data
+            )
+            return content, status_code, response_headers
+        finally:
+            _record_latency(method, url, (time.perf_counter() - started) * 1000, status_code)
+
+    def sleep_async(self, secs):
+        if asyncio.get_running_loop() not in _pooled_loops:
+            return asyncio.sleep(secs)
+        return self._async_client().sleep_async(secs)
+
+
+# Event loops that serve many requests, so an httpx pool on them is reused
+_pooled_loops = weakref.WeakSet()
+
+
+def with_async_pool(application):
+    """
+    Wrap an ASGI application so async Stripe calls on its event loop share one
+    httpx connection pool (see core/asgi.py).
+    """
+    async def pooled_application(scope, receive, send):
+        _pooled_loops.add(asyncio.get_running_loop())
+        return await application(scope, receive, send)
+
+    return pooled_application
+
+
+def _build_http_client():
+    """Create the shared pooled HTTP client used for every Stripe call."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.STRIPE_HTTP_POOL_SIZE,
+        # Retries are handled by the Stripe SDK so they stay idempotency-keyed
+        max_retries=0,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    timeout = (settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT)
+    return InstrumentedRequestsClient(
+        timeout=timeout,
+        session=session,
+        async_timeout=sum(timeout),
+    )
+
+
 # Initialize Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+stripe.default_http_client = _build_http_client()
+if settings.STRIPE_API_BASE:
+    # e.g. the local stand-in from `manage.py fake_stripe`
+    stripe.api_base = settings.STRIPE_API_BASE
 
 # Export stripe module for use by other views
-__all__ = ['stripe', 'logger']
+__all__ = ['stripe', 'logger', 'register_latency_hook', 'with_async_pool']
@@ -1,4 +1,5 @@
 """Subscription management views."""
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -8,10 +9,11 @@ from ..forms import CancelSubscriptionForm
 
 
 @login_required
-def cancel_subscription(request):
+async def cancel_subscription(request):
     """Cancel user subscription."""
+    user = await request.auser()
     try:
-        stripe_customer = request.user.stripe_customer
+        stripe_customer = await StripeCustomer.objects.aget(user=user)
 
         if not stripe_customer.stripe_subscription_id:
             messages.error(request, 'No active subscription found.')
@@ -21,12 +23,12 @@ def cancel_subscription(request):
             form = CancelSubscriptionForm(request.POST)
             if form.is_valid():
                 # Cancel subscription at period end
-                stripe.Subscription.modify(
+                await stripe.Subscription.modify_async(
                     stripe_customer.stripe_subscription_id,
                     cancel_at_period_end=True
                 )
                 stripe_customer.cancel_at_period_end = True
-                stripe_customer.save()
+                await stripe_customer.asave(update_fields=['cancel_at_period_end', 'updated_at'])
 
                 messages.success(request, 'Subscription will be canceled at the end of the billing period.')
                 return redirect('accounts:dashboard')
@@ -40,7 +42,8 @@ def cancel_subscription(request):
             'form': form,
             'stripe_customer': stripe_customer,
         }
-        return render(request, 'accounts/cancel_subscription.html', context)
+        # Template rendering (context processors, lazy request.user) is sync-only
+        return await sync_to_async(render)(request, 'accounts/cancel_subscription.html', context)
 
     except StripeCustomer.DoesNotExist:
         messages.error(request, 'No subscription found.')
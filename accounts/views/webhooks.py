@@ -3,9 +3,16 @@ from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.conf import settings
-from datetime import datetime, timezone
+from django.db import IntegrityError, connections, transaction
+from django.db.models import sql
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import time
 import stripe
-from ..models import StripeCustomer, Payment
+from core.metrics import WEBHOOK_EVENTS, WEBHOOK_SIGNATURE_SECONDS, observe_webhook
+from ..entitlements import invalidate_entitlements
+from ..models import StripeCustomer, Payment, WebhookEvent
+from ..rollups import record_membership_change, record_payment
 from .stripe_client import logger
 
 
@@ -19,32 +26,167 @@ def stripe_webhook(request):
 
     logger.info("Received Stripe webhook request")
 
+    started = time.perf_counter()
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, webhook_secret
         )
     except ValueError as e:
         logger.error(f"Webhook error: Invalid payload - {str(e)}")
+        WEBHOOK_EVENTS.labels('unknown', 'invalid_payload').inc()
         return HttpResponse(status=400)
     except stripe.error.SignatureVerificationError as e:
         logger.error(f"Webhook error: Invalid signature - {str(e)}")
+        WEBHOOK_EVENTS.labels('unknown', 'invalid_signature').inc()
         return HttpResponse(status=400)
+    finally:
+        WEBHOOK_SIGNATURE_SECONDS.observe(time.perf_counter() - started)
+
+    data = event.to_dict()
+
+    # The ledger entry is written in the same transaction as the handler's
+    # changes. If the worker dies mid-handler both are rolled back, so Stripe's
+    # retry applies the event instead of finding it stuck in processing.
+    with transaction.atomic():
+        record, created = _record_event(data)
+
+        if not created and record.status != 'failed':
+            # Already processed or queued - Stripe is redelivering
+            logger.info(f"Skipping duplicate webhook event: {data['type']} ({data['id']})")
+            WEBHOOK_EVENTS.labels(data['type'], 'duplicate').inc()
+            return HttpResponse(status=200)
+
+        if not created:
+            # Redelivery of an event that failed earlier - try it again
+            record.payload = data
+
+        if settings.STRIPE_WEBHOOK_QUEUE:
+            # Ack-first: leave the event pending for process_webhooks to drain
+            if not created:
+                record.status = 'pending'
+                record.next_attempt_at = None
+                record.save(update_fields=['payload', 'status', 'next_attempt_at'])
+            logger.info(f"Queued webhook event: {data['type']} ({data['id']})")
+            WEBHOOK_EVENTS.labels(data['type'], 'queued').inc()
+            return HttpResponse(status=200)
+
+        processed = apply_webhook_event(record)
+
+    if not processed:
+        # Let Stripe redeliver the event
+        return HttpResponse(status=500)
+    return HttpResponse(status=200)
+
+
+def _record_event(data):
+    """
+    Return the ledger entry for an event, creating it if this is the first delivery.
+
+    Existing entries are found with a single lookup on the unique event ID index
+    and locked, so concurrent redeliveries of a failed event run it only once.
+    Must be called inside a transaction.
+    """
+    record = (
+        WebhookEvent.objects
+        .select_for_update()
+        .filter(stripe_event_id=data['id'])
+        .only('id', 'stripe_event_id', 'status', 'attempts')
+        .first()
+    )
+    if record:
+        return record, False
 
+    try:
+        with transaction.atomic():
+            record = WebhookEvent.objects.create(
+                stripe_event_id=data['id'],
+                event_type=data['type'],
+                stripe_customer_id=event_customer_id(data),
+                payload=data,
+                # Inline events are claimed right away so the queue worker skips
+                # them; the status is only committed once the handler has run
+                status='pending' if settings.STRIPE_WEBHOOK_QUEUE else 'processing',
+            )
+    except IntegrityError:
+        # A concurrent delivery of the same event won the insert
+        return (
+            WebhookEvent.objects
+            .select_for_update()
+            .only('id', 'stripe_event_id', 'status', 'attempts')
+            .get(stripe_event_id=data['id'])
+        ), False
+
+    return record, True
+
+
+def apply_webhook_event(record, max_attempts=1, retry_delay=0):
+    """
+    Run a ledger entry through its handler and record the outcome and duration.
+
+    Handlers raise on failure. Their writes are rolled back and the entry is
+    left pending for another attempt, or failed once max_attempts is reached,
+    so a redelivery from Stripe runs it again. A pending entry is not retried
+    for retry_delay seconds, doubled for each later attempt. Returns True if
+    the event was processed.
+    """
+    started = time.perf_counter()
+    record.attempts += 1
+    record.next_attempt_at = None
+
+    try:
+        with transaction.atomic():
+            process_event(record.payload)
+    except Exception as e:
+        logger.error(f"Error processing webhook event {record.stripe_event_id}: {str(e)}")
+        record.last_error = str(e)
+        if record.attempts >= max_attempts:
+            record.status = 'failed'
+        else:
+            record.status = 'pending'
+            record.next_attempt_at = datetime.now(timezone.utc) + timedelta(
+                seconds=retry_delay * 2 ** (record.attempts - 1)
+            )
+    else:
+        record.status = 'processed'
+        record.last_error = None
+        record.processed_at = datetime.now(timezone.utc)
+
+    record.duration_ms = (time.perf_counter() - started) * 1000
+    record.save(update_fields=[
+        'payload', 'status', 'attempts', 'last_error', 'next_attempt_at', 'processed_at', 'duration_ms'
+    ])
+    # A pending event will be retried by process_webhooks
+    outcome = 'retry' if record.status == 'pending' else record.status
+    observe_webhook(record.payload, outcome, record.duration_ms / 1000)
+    return record.status == 'processed'
+
+
+def event_customer_id(event):
+    """Return the Stripe customer ID an event belongs to, if any."""
+    obj = event['data']['object']
+    if obj.get('object') == 'customer':
+        return obj.get('id')
+    return obj.get('customer')
+
+
+def process_event(event):
+    """Dispatch a verified Stripe event to its handler."""
     event_type = event['type']
+    event_created = event.get('created')
     logger.info(f"Processing webhook event: {event_type}")
 
     # Handle the event
     if event_type == 'customer.subscription.created':
         subscription = event['data']['object']
-        _handle_subscription_created(subscription)
+        _handle_subscription_created(subscription, event_created)
 
     elif event_type == 'customer.subscription.updated':
         subscription = event['data']['object']
-        _handle_subscription_updated(subscription)
+        _handle_subscription_updated(subscription, event_created)
 
     elif event_type == 'customer.subscription.deleted':
         subscription = event['data']['object']
-        _handle_subscription_deleted(subscription)
+        _handle_subscription_deleted(subscription, event_created)
 
     elif event_type == 'invoice.payment_succeeded':
         invoice = event['data']['object']
@@ -52,106 +194,184 @@ def stripe_webhook(request):
 
     elif event_type == 'invoice.payment_failed':
         invoice = event['data']['object']
-        _handle_invoice_payment_failed(invoice)
+        _handle_invoice_payment_failed(invoice, event_created)
 
     else:
         logger.info(f"Unhandled webhook event type: {event_type}")
 
     logger.info(f"Successfully processed webhook event: {event_type}")
-    return HttpResponse(status=200)
-
 
-def _handle_subscription_created(subscription):
-    """Handle subscription created event."""
-    customer_id = subscription['customer']
-    subscription_id = subscription['id']
 
-    logger.info(f"Processing subscription.created for customer {customer_id}, subscription {subscription_id}")
-
-    try:
-        stripe_customer = StripeCustomer.objects.get(stripe_customer_id=customer_id)
-
-        stripe_customer.stripe_subscription_id = subscription_id
-        stripe_customer.subscription_status = subscription['status']
-        stripe_customer.subscription_plan = subscription['items']['data'][0]['price']['id']
+def _subscription_period_end(subscription):
+    """Return the datetime the subscription's current period ends, if known."""
+    # Use cancel_at if subscription is being canceled, otherwise use current_period_end
+    if subscription['cancel_at_period_end'] and subscription.get('cancel_at'):
+        period_end_timestamp = subscription['cancel_at']
+    else:
+        period_end_timestamp = subscription.get('current_period_end')
 
+    if period_end_timestamp:
         # Convert Unix timestamp to datetime
-        # Use cancel_at if subscription is being canceled, otherwise use current_period_end
-        if subscription['cancel_at_period_end'] and subscription.get('cancel_at'):
-            period_end_timestamp = subscription['cancel_at']
+        return datetime.fromtimestamp(period_end_timestamp, tz=timezone.utc)
+    return None
+
+
+# Months per billing interval, to turn a price into a monthly amount
+INTERVAL_MONTHS = {'day': Decimal(12) / 365, 'week': Decimal(12) / 52, 'month': 1, 'year': 12}
+
+
+def _subscription_monthly_amount(subscription):
+    """Return what the subscription bills per month, if its price is in the payload."""
+    items = (subscription.get('items') or {}).get('data')
+    if not items:
+        return None
+    item = items[0]
+    price = item['price']
+    recurring = price.get('recurring')
+    if price.get('unit_amount') is None or not recurring:
+        return None
+
+    months = INTERVAL_MONTHS[recurring['interval']] * recurring.get('interval_count', 1)
+    amount = Decimal(price['unit_amount']) * item.get('quantity', 1) / 100 / months
+    return amount.quantize(Decimal('0.01'))
+
+
+# Fields whose change moves a customer's counts in DailyMembership
+MEMBERSHIP_FIELDS = ('subscription_status', 'monthly_amount')
+
+
+def _update_returning_user_ids(queryset, **values):
+    """
+    queryset.update(**values) as a single UPDATE ... RETURNING user_id.
+
+    Returns the user IDs of the rows updated. Django's update() only returns a
+    count; SQLite (3.35+) and PostgreSQL both support RETURNING.
+    """
+    query = queryset.query.chain(sql.UpdateQuery)
+    query.add_update_values(values)
+    statement, params = query.get_compiler(queryset.db).as_sql()
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(f"{statement} RETURNING {connection.ops.quote_name('user_id')}", params)
+        return [user_id for user_id, in cursor.fetchall()]
+
+
+def _update_stripe_customer(customer_id, event_created, **fields):
+    """
+    Apply an event's changes to a StripeCustomer with a conditional UPDATE.
+
+    The row is only written if no newer event has been applied to it, so events
+    delivered out of order can never overwrite fresher data. An event that
+    leaves the status and monthly amount as they are (renewals, period and
+    cancel_at_period_end changes) is applied by that one UPDATE. One that
+    changes them matches nothing, and the row is then locked and read so the
+    change can be counted in DailyMembership. Returns the customer's user ID
+    if the row was updated, otherwise None.
+    """
+    if event_created is None:
+        event_created = int(time.time())
+
+    customers = StripeCustomer.objects.filter(
+        stripe_customer_id=customer_id,
+        # Stripe timestamps have one-second resolution, and a subscription is
+        # often created and updated within the same second
+        last_event_created__lte=event_created,
+    )
+    values = {'last_event_created': event_created, 'updated_at': datetime.now(timezone.utc), **fields}
+    # NULL never equals NULL in SQL, so an unset amount needs isnull
+    unchanged = {
+        f'{name}__isnull' if fields[name] is None else name: True if fields[name] is None else fields[name]
+        for name in MEMBERSHIP_FIELDS if name in fields
+    }
+
+    with transaction.atomic():
+        user_ids = _update_returning_user_ids(customers.filter(**unchanged), **values)
+        if not user_ids and unchanged:
+            # The lock keeps other events off the row until the change is counted
+            previous = customers.select_for_update().values('pk', 'user_id', *MEMBERSHIP_FIELDS).first()
+            if previous is not None:
+                customers.filter(pk=previous['pk']).update(**values)
+                record_membership_change(
+                    previous['subscription_status'],
+                    previous['monthly_amount'],
+                    fields.get('subscription_status', previous['subscription_status']),
+                    fields.get('monthly_amount', previous['monthly_amount']),
+                )
+                user_ids = [previous['user_id']]
+
+    if not user_ids:
+        # Only the no-op path pays for another query, to tell stale from missing
+        if StripeCustomer.objects.filter(stripe_customer_id=customer_id).exists():
+            logger.info(f"Ignoring stale event for customer {customer_id} (created {event_created})")
         else:
-            period_end_timestamp = subscription.get('current_period_end')
+            logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
+        return None
 
-        if period_end_timestamp:
-            stripe_customer.current_period_end = datetime.fromtimestamp(
-                period_end_timestamp,
-                tz=timezone.utc
-            )
+    # After the commit, or a request could cache the old row again before it
+    transaction.on_commit(lambda: invalidate_entitlements(user_ids))
+    return user_ids[0]
+
+
+def _handle_subscription_created(subscription, event_created=None):
+    """Handle subscription created event."""
+    customer_id = subscription['customer']
+    subscription_id = subscription['id']
 
-        stripe_customer.cancel_at_period_end = subscription['cancel_at_period_end']
-        stripe_customer.save()
+    logger.info(f"Processing subscription.created for customer {customer_id}, subscription {subscription_id}")
 
+    fields = {
+        'stripe_subscription_id': subscription_id,
+        'subscription_status': subscription['status'],
+        'subscription_plan': subscription['items']['data'][0]['price']['id'],
+        'cancel_at_period_end': subscription['cancel_at_period_end'],
+    }
+    period_end = _subscription_period_end(subscription)
+    if period_end:
+        fields['current_period_end'] = period_end
+    monthly_amount = _subscription_monthly_amount(subscription)
+    if monthly_amount is not None:
+        fields['monthly_amount'] = monthly_amount
+
+    if _update_stripe_customer(customer_id, event_created, **fields):
         logger.info(f"Successfully updated subscription for customer {customer_id}")
-    except StripeCustomer.DoesNotExist:
-        logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
-    except Exception as e:
-        logger.error(f"Error handling subscription.created for {customer_id}: {str(e)}")
 
 
-def _handle_subscription_updated(subscription):
+def _handle_subscription_updated(subscription, event_created=None):
     """Handle subscription updated event."""
     customer_id = subscription['customer']
     subscription_id = subscription['id']
 
     logger.info(f"Processing subscription.updated for customer {customer_id}, subscription {subscription_id}")
 
-    try:
-        stripe_customer = StripeCustomer.objects.get(stripe_customer_id=customer_id)
-
-        stripe_customer.subscription_status = subscription['status']
-
-        # Convert Unix timestamp to datetime
-        # Use cancel_at if subscription is being canceled, otherwise use current_period_end
-        if subscription['cancel_at_period_end'] and subscription.get('cancel_at'):
-            period_end_timestamp = subscription['cancel_at']
-        else:
-            period_end_timestamp = subscription.get('current_period_end')
-
-        if period_end_timestamp:
-            stripe_customer.current_period_end = datetime.fromtimestamp(
-                period_end_timestamp,
-                tz=timezone.utc
-            )
-
-        stripe_customer.cancel_at_period_end = subscription['cancel_at_period_end']
-        stripe_customer.save()
-
+    fields = {
+        'subscription_status': subscription['status'],
+        'cancel_at_period_end': subscription['cancel_at_period_end'],
+    }
+    period_end = _subscription_period_end(subscription)
+    if period_end:
+        fields['current_period_end'] = period_end
+    monthly_amount = _subscription_monthly_amount(subscription)
+    if monthly_amount is not None:
+        fields['monthly_amount'] = monthly_amount
+
+    if _update_stripe_customer(customer_id, event_created, **fields):
         logger.info(f"Successfully updated subscription for customer {customer_id}")
-    except StripeCustomer.DoesNotExist:
-        logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
-    except Exception as e:
-        logger.error(f"Error handling subscription.updated for {customer_id}: {str(e)}")
 
 
-def _handle_subscription_deleted(subscription):
+def _handle_subscription_deleted(subscription, event_created=None):
     """Handle subscription deleted event."""
     customer_id = subscription['customer']
     subscription_id = subscription['id']
 
     logger.info(f"Processing subscription.deleted for customer {customer_id}, subscription {subscription_id}")
 
-    try:
-        stripe_customer = StripeCustomer.objects.get(stripe_customer_id=customer_id)
-
-        stripe_customer.subscription_status = 'canceled'
-        stripe_customer.stripe_subscription_id = None
-        stripe_customer.save()
-
+    if _update_stripe_customer(
+        customer_id,
+        event_created,
+        subscription_status='canceled',
+        stripe_subscription_id=None,
+    ):
         logger.info(f"Successfully marked subscription as canceled for customer {customer_id}")
-    except StripeCustomer.DoesNotExist:
-        logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
-    except Exception as e:
-        logger.error(f"Error handling subscription.deleted for {customer_id}: {str(e)}")
 
 
 def _handle_invoice_paid(invoice):
@@ -163,14 +383,18 @@ def _handle_invoice_paid(invoice):
     logger.info(f"Processing invoice.payment_succeeded for customer {customer_id}, payment {payment_id}")
 
     try:
-        stripe_customer = StripeCustomer.objects.get(stripe_customer_id=customer_id)
+        stripe_customer = StripeCustomer.objects.only('id', 'user_id').get(stripe_customer_id=customer_id)
+    except StripeCustomer.DoesNotExist:
+        logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
+        return
 
-        # Use get_or_create to handle duplicate webhooks
+    # Use get_or_create to handle duplicate webhooks
+    with transaction.atomic():
         payment, created = Payment.objects.get_or_create(
             stripe_payment_id=payment_id,
             defaults={
-                'user': stripe_customer.user,
-                'amount': invoice['amount_paid'] / 100,  # Convert from cents
+                'user_id': stripe_customer.user_id,
+                'amount': Decimal(invoice['amount_paid']) / 100,  # Convert from cents
                 'currency': invoice['currency'],
                 'status': 'succeeded',
                 'payment_type': 'subscription' if invoice.get('subscription') else 'one_time',
@@ -178,19 +402,16 @@ def _handle_invoice_paid(invoice):
                 'invoice_url': invoice.get('hosted_invoice_url', '')
             }
         )
-
         if created:
-            logger.info(f"Created new payment record for {payment_id}")
-        else:
-            logger.info(f"Payment record already exists for {payment_id}, skipping duplicate")
+            record_payment(payment)
 
-    except StripeCustomer.DoesNotExist:
-        logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
-    except Exception as e:
-        logger.error(f"Error handling invoice.payment_succeeded for {customer_id}: {str(e)}")
+    if created:
+        logger.info(f"Created new payment record for {payment_id}")
+    else:
+        logger.info(f"Payment record already exists for {payment_id}, skipping duplicate")
 
 
-def _handle_invoice_payment_failed(invoice):
+def _handle_invoice_payment_failed(invoice, event_created=None):
     """Handle invoice payment failed event."""
     customer_id = invoice['customer']
     # Use invoice ID as payment ID (payment_intent field removed in Stripe API 2025-03-31)
@@ -198,19 +419,23 @@ def _handle_invoice_payment_failed(invoice):
 
     logger.info(f"Processing invoice.payment_failed for customer {customer_id}, payment {payment_id}")
 
-    try:
-        stripe_customer = StripeCustomer.objects.get(stripe_customer_id=customer_id)
-
-        # Update subscription status
-        stripe_customer.subscription_status = 'past_due'
-        stripe_customer.save()
+    # Update subscription status
+    user_id = _update_stripe_customer(customer_id, event_created, subscription_status='past_due')
+    if user_id is None:
+        # A newer event already set the status; the payment is still recorded
+        user_id = (
+            StripeCustomer.objects.filter(stripe_customer_id=customer_id).values_list('user_id', flat=True).first()
+        )
+        if user_id is None:
+            return
 
-        # Use get_or_create to handle duplicate webhooks
+    # Use get_or_create to handle duplicate webhooks
+    with transaction.atomic():
         payment, created = Payment.objects.get_or_create(
             stripe_payment_id=payment_id,
             defaults={
-                'user': stripe_customer.user,
-                'amount': invoice['amount_due'] / 100,
+                'user_id': user_id,
+                'amount': Decimal(invoice['amount_due']) / 100,
                 'currency': invoice['currency'],
                 'status': 'failed',
                 'payment_type': 'subscription' if invoice.get('subscription') else 'one_time',
@@ -218,13 +443,10 @@ def _handle_invoice_payment_failed(invoice):
                 'invoice_url': invoice.get('hosted_invoice_url', '')
             }
         )
-
         if created:
-            logger.info(f"Created new failed payment record for {payment_id}")
-        else:
-            logger.info(f"Failed payment record already exists for {payment_id}, skipping duplicate")
+            record_payment(payment)
 
-    except StripeCustomer.DoesNotExist:
-        logger.error(f"StripeCustomer not found for customer_id: {customer_id}")
-    except Exception as e:
-        logger.error(f"Error handling invoice.payment_failed for {customer_id}: {str(e)}")
+    if created:
+        logger.info(f"Created new failed payment record for {payment_id}")
+    else:
+        logger.info(f"Failed payment record already exists for {payment_id}, skipping duplicate")
@@ -0,0 +1,175 @@
+"""
+Simulated Stripe webhook traffic.
+
+generate_events() builds a realistic event stream for a set of customers:
+sign-ups, monthly renewals, failed payments and cancellations, optionally with
+neighbouring events delivered out of order and with duplicate redeliveries.
+sign() produces the Stripe-Signature header Stripe would send, and
+expected_state() works out what StripeCustomer and Payment should hold once a
+stream has been applied. Used by `manage.py loadtest_webhooks`.
+"""
+from decimal import Decimal
+import hashlib
+import hmac
+import itertools
+import random
+import time
+import uuid
+
+PERIOD_SECONDS = 30 * 24 * 60 * 60
+
+# The subscription status each customer-updating event leaves behind
+_EVENT_STATUS = {
+    'customer.subscription.created': lambda obj: obj['status'],
+    'customer.subscription.updated': lambda obj: obj['status'],
+    'customer.subscription.deleted': lambda obj: 'canceled',
+    'invoice.payment_failed': lambda obj: 'past_due',
+}
+
+
+def sign(payload, secret, timestamp=None):
+    """Return the Stripe-Signature header for a raw JSON payload."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def generate_events(customer_ids, cycles=3, failure_rate=0.1, cancel_rate=0.1,
+                    out_of_order=0.0, duplicates=0.0, start=None, seed=None,
+                    price_id='price_loadtest', amount=7000, currency='usd'):
+    """
+    Return a list of Stripe events for the given customers, in delivery order.
+
+    Each customer signs up, then goes through `cycles` billing periods that
+    are paid or, with probability failure_rate, fail. Each customer then
+    cancels with probability cancel_rate. Every customer's events have
+    strictly increasing `created` timestamps from `start`. Customers are
+    interleaved at random. Afterwards a neighbouring pair is swapped with
+    probability out_of_order, and an event is delivered a second time later on
+    with probability duplicates.
+    """
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:10]
+    ids = itertools.count()
+    start = int(time.time()) if start is None else start
+
+    def event(event_type, obj, created):
+        return {
+            'id': f'evt_{run}{next(ids):07d}',
+            'object': 'event',
+            'type': event_type,
+            'created': created,
+            'livemode': False,
+            'data': {'object': obj},
+        }
+
+    streams = []
+    for customer in customer_ids:
+        subscription_id = f'sub_{run}{next(ids):07d}'
+        period_end = start + PERIOD_SECONDS
+        created = itertools.count(start)
+
+        def subscription(status):
+            return {
+                'id': subscription_id,
+                'object': 'subscription',
+                'customer': customer,
+                'status': status,
+                'items': {'data': [{
+                    'price': {'id': price_id, 'unit_amount': amount, 'recurring': {'interval': 'month'}},
+                    'quantity': 1,
+                }]},
+                'current_period_end': period_end,
+                'cancel_at_period_end': False,
+                'cancel_at': None,
+            }
+
+        def invoice(paid):
+            return {
+                'id': f'in_{run}{next(ids):07d}',
+                'object': 'invoice',
+                'customer': customer,
+                'subscription': subscription_id,
+                'amount_paid': amount if paid else 0,
+                'amount_due': amount,
+                'currency': currency,
+                'description': 'Monthly membership',
+                'hosted_invoice_url': '',
+            }
+
+        stream = [event('customer.subscription.created', subscription('active'), next(created))]
+        for _ in range(cycles):
+            if rng.random() < failure_rate:
+                stream.append(event('invoice.payment_failed', invoice(paid=False), next(created)))
+            else:
+                period_end += PERIOD_SECONDS
+                stream.append(event('invoice.payment_succeeded', invoice(paid=True), next(created)))
+                stream.append(event('customer.subscription.updated', subscription('active'), next(created)))
+        if rng.random() < cancel_rate:
+            stream.append(event('customer.subscription.deleted', subscription('canceled'), next(created)))
+        streams.append(stream)
+
+    # Interleave customers while keeping each customer's own order
+    events = []
+    positions = [0] * len(streams)
+    remaining = [index for index, stream in enumerate(streams) if stream]
+    while remaining:
+        index = rng.choice(remaining)
+        events.append(streams[index][positions[index]])
+        positions[index] += 1
+        if positions[index] == len(streams[index]):
+            remaining.remove(index)
+
+    for index in range(len(events) - 1):
+        if rng.random() < out_of_order:
+            events[index], events[index + 1] = events[index + 1], events[index]
+
+    delivered = []
+    redeliveries = {}
+    for index, item in enumerate(events):
+        delivered.append(item)
+        delivered.extend(redeliveries.pop(index, []))
+        if rng.random() < duplicates:
+            redeliveries.setdefault(rng.randint(index, len(events) - 1), []).append(item)
+    return delivered
+
+
+def expected_state(events):
+    """
+    Work out the rows a stream should leave behind.
+
+    Returns {'customers': {customer_id: subscription_status}, 'payments':
+    {invoice_id: {'customer', 'status', 'amount', 'currency'}}}. A customer's
+    status comes from its newest event by `created` (ties go to the later
+    delivery), and redeliveries are ignored. Payments are recorded once per
+    invoice.
+    """
+    customers = {}
+    payments = {}
+    seen = set()
+    for order, event in enumerate(events):
+        if event['id'] in seen:
+            continue
+        seen.add(event['id'])
+        obj = event['data']['object']
+
+        status = _EVENT_STATUS.get(event['type'])
+        if status:
+            key = (event.get('created') or 0, order)
+            current = customers.get(obj['customer'])
+            if current is None or key > current[0]:
+                customers[obj['customer']] = (key, status(obj))
+
+        if event['type'] in ('invoice.payment_succeeded', 'invoice.payment_failed'):
+            paid = event['type'] == 'invoice.payment_succeeded'
+            payments.setdefault(obj['id'], {
+                'customer': obj['customer'],
+                'status': 'succeeded' if paid else 'failed',
+                'amount': Decimal(obj['amount_paid'] if paid else obj['amount_due']) / 100,
+                'currency': obj['currency'],
+            })
+
+    return {
+        'customers': {customer: status for customer, (_, status) in customers.items()},
+        'payments': payments,
+    }
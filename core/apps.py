@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from accounts.views.stripe_client import register_latency_hook
+        from . import signals  # noqa: F401
+        from .metrics import observe_stripe_call
+        register_latency_hook(observe_stripe_call)
@@ -14,3 +14,15 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.local")
 
 application = get_asgi_application()
+
+# Compile templates before the worker takes traffic
+from core.template_warmup import warm_templates_on_startup  # noqa: E402
+warm_templates_on_startup()
+
+# Entitlement and session invalidations only reach other workers through a shared cache
+from core.caches import warn_if_cache_not_shared  # noqa: E402
+warn_if_cache_not_shared()
+
+# Async Stripe calls on the server's event loop share one connection pool
+from accounts.views.stripe_client import with_async_pool  # noqa: E402
+application = with_async_pool(application)
@@ -0,0 +1,143 @@
+"""
+Benchmark cases for `manage.py benchmark`.
+
+Fixtures seeds the database (see accounts.seed) and holds the logged-in
+clients. Each entry in CASES takes the fixtures and returns a callable that
+performs one call of the view or webhook handler being measured. The
+"stripe:" cases call the Stripe API, so they run against the in-process fake
+(accounts.fake_stripe).
+"""
+import itertools
+import time
+from django.test import Client
+from django.urls import reverse
+from accounts.models import StripeCustomer, User
+from accounts.rollups import rebuild_membership_totals, rebuild_revenue
+from accounts.seed import LOADTEST_EMAIL_DOMAIN, seed_members
+from accounts.views import webhooks
+from accounts.views.account import _encode_cursor, _payments_page
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Fixtures:
+    """Seeded members plus anonymous, member and staff clients."""
+
+    def __init__(self, members, payments_per_member, stripe_url):
+        self.stripe_url = stripe_url
+        self.customer_ids = seed_members(members, payments_per_member)
+        rebuild_revenue()
+        rebuild_membership_totals()
+        self.member_user = StripeCustomer.objects.select_related('user').get(stripe_customer_id=self.customer_ids[0]).user
+        admin = User.objects.create_superuser(
+            email=f'benchmark-admin@{LOADTEST_EMAIL_DOMAIN}',
+            first_name='Benchmark',
+            last_name='Admin',
+        )
+
+        self.anonymous = Client()
+        self.member = Client()
+        self.member.force_login(self.member_user)
+        self.admin = Client()
+        self.admin.force_login(admin)
+
+        # Handlers leave the first member, whose pages are measured, alone
+        self._customers = itertools.cycle(self.customer_ids[1:] or self.customer_ids)
+        self._created = itertools.count(int(time.time()))
+        self._ids = itertools.count()
+
+    def subscription(self, status='active'):
+        return {
+            'id': f'sub_benchmark{next(self._ids):07d}',
+            'customer': next(self._customers),
+            'status': status,
+            'items': {'data': [{
+                'price': {'id': 'price_loadtest', 'unit_amount': 7000, 'recurring': {'interval': 'month'}},
+                'quantity': 1,
+            }]},
+            'current_period_end': int(time.time()) + 30 * 24 * 60 * 60,
+            'cancel_at_period_end': False,
+            'cancel_at': None,
+        }
+
+    def invoice(self):
+        return {
+            'id': f'in_benchmark{next(self._ids):07d}',
+            'customer': next(self._customers),
+            'subscription': 'sub_benchmark',
+            'amount_paid': 7000,
+            'amount_due': 7000,
+            'currency': 'usd',
+            'description': 'Monthly membership',
+            'hosted_invoice_url': '',
+        }
+
+    def created(self):
+        """A fresh event timestamp, so no handler call is skipped as stale."""
+        return next(self._created)
+
+
+def _post(client, url_name, data, redirect_prefix):
+    """Time a POST that should redirect to a URL starting with redirect_prefix."""
+    url = reverse(url_name)
+
+    def call():
+        response = client.post(url, data)
+        location = response.get('Location', '')
+        if response.status_code != 302 or not location.startswith(redirect_prefix):
+            raise BenchmarkError(f'POST {url} returned {response.status_code} {location}')
+
+    return call
+
+
+def _get(client, url_name, query=None):
+    url = reverse(url_name)
+
+    def call():
+        response = client.get(url, query)
+        if response.status_code != 200:
+            raise BenchmarkError(f'GET {url} returned {response.status_code}')
+
+    return call
+
+
+CASES = {
+    'view:home (anonymous)': lambda f: _get(f.anonymous, 'home'),
+    'view:home (member)': lambda f: _get(f.member, 'home'),
+    'view:dashboard': lambda f: _get(f.member, 'accounts:dashboard'),
+    'view:billing': lambda f: _get(f.member, 'accounts:billing'),
+    # A "Load more" request for the payments after the newest one
+    'view:billing_payments': lambda f: _get(
+        f.member, 'accounts:billing_payments', {'cursor': _encode_cursor(_payments_page(f.member_user)[0][0])}
+    ),
+    'view:settings': lambda f: _get(f.member, 'accounts:settings'),
+    'admin:payment changelist': lambda f: _get(f.admin, 'admin:accounts_payment_changelist'),
+    'admin:stripecustomer changelist': lambda f: _get(f.admin, 'admin:accounts_stripecustomer_changelist'),
+    'admin:user changelist': lambda f: _get(f.admin, 'admin:accounts_user_changelist'),
+    'admin:webhookevent changelist': lambda f: _get(f.admin, 'admin:accounts_webhookevent_changelist'),
+    'admin:dashboard': lambda f: _get(f.admin, 'admin:accounts_dashboard'),
+    'stripe:create_checkout_session': lambda f: _post(
+        f.member, 'accounts:create_checkout_session', {'payment_type': 'subscription'}, f.stripe_url
+    ),
+    'stripe:customer_portal': lambda f: _post(f.member, 'accounts:customer_portal', {}, f.stripe_url),
+    'stripe:cancel_subscription': lambda f: _post(
+        f.member, 'accounts:cancel_subscription', {'confirm': 'on'}, reverse('accounts:dashboard')
+    ),
+    'webhook:_handle_subscription_created': lambda f: (
+        lambda: webhooks._handle_subscription_created(f.subscription(), f.created())
+    ),
+    'webhook:_handle_subscription_updated': lambda f: (
+        lambda: webhooks._handle_subscription_updated(f.subscription(), f.created())
+    ),
+    'webhook:_handle_subscription_deleted': lambda f: (
+        lambda: webhooks._handle_subscription_deleted(f.subscription('canceled'), f.created())
+    ),
+    'webhook:_handle_invoice_paid': lambda f: (
+        lambda: webhooks._handle_invoice_paid(f.invoice())
+    ),
+    'webhook:_handle_invoice_payment_failed': lambda f: (
+        lambda: webhooks._handle_invoice_payment_failed(f.invoice(), f.created())
+    ),
+}
@@ -0,0 +1,33 @@
+"""
+Checks for caches that every worker process must share.
+
+Entitlements, the cached request.user and cached_db sessions are invalidated
+by deleting cache keys, which only reaches other workers when the cache lives
+outside the process (Redis, memcached, the database or the file system).
+"""
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_is_shared(alias='default'):
+    """Return whether the cache is visible to every worker process."""
+    return not isinstance(caches[alias], PROCESS_LOCAL_BACKENDS)
+
+
+def warn_if_cache_not_shared(alias='default'):
+    """Log a warning at worker start when a production cache is process-local."""
+    if settings.DEBUG or cache_is_shared(alias):
+        return
+    backend = type(caches[alias]).__name__
+    logger.warning(
+        f'The {alias!r} cache uses {backend}, which is private to this process. '
+        f'With more than one worker, entitlements, cached users and sessions '
+        f'go stale in the others. Set REDIS_URL and install the redis extra.'
+    )
@@ -0,0 +1,205 @@
+"""
+Purged and critical CSS.
+
+The build_css command (also run by collectstatic) scans the templates for the
+words they use and keeps only the Bootstrap and Bootstrap Icons rules whose
+class selectors all appear there. It writes:
+
+- css/build/site.css: purged Bootstrap + purged icons + styles.css
+- css/build/critical.css: the subset of site.css needed by the page shell and
+  hero, inlined in <head> by the {% stylesheets %} tag
+- css/build/fonts/bootstrap-icons.woff2: the icon font cut down to the glyphs
+  in use (needs fontTools, otherwise the full font is referenced)
+"""
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+BUILD_DIR = 'css/build'
+SITE_CSS = f'{BUILD_DIR}/site.css'
+CRITICAL_CSS = f'{BUILD_DIR}/critical.css'
+ICON_FONT = f'{BUILD_DIR}/fonts/bootstrap-icons.woff2'
+
+# Purged in order and concatenated; styles.css is ours and kept whole
+PURGED_SOURCES = ('css/bootstrap.min.css', 'css/bootstrap-icons.min.css')
+UNPURGED_SOURCES = ('css/styles.css',)
+
+# Templates rendered on every page or above the fold on the homepage
+CRITICAL_TEMPLATES = ('_base.html', '_messages.html', 'cotton/navbar.html', 'cotton/hero.html')
+
+# Classes that never appear literally in a template: added by Bootstrap's JS,
+# or built from variables such as alert-{{ message.tags }}
+SAFELIST = {
+    'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'collapsed',
+    'active', 'disabled', 'modal-open', 'modal-backdrop', 'offcanvas-backdrop',
+    'dropdown-menu-end', 'dropdown-menu-start',
+    'alert-debug', 'alert-info', 'alert-success', 'alert-warning', 'alert-error', 'alert-danger',
+    'is-valid', 'is-invalid', 'was-validated',
+}
+
+# Scanned for class names besides templates (form widget attrs and the like)
+PYTHON_SOURCE_DIRS = ('accounts', 'core')
+
+# At-rules whose block holds declarations rather than rules
+DECLARATION_AT_RULES = ('@font-face', '@page', '@property', '@counter-style')
+
+_WORD_RE = re.compile(r'[A-Za-z0-9_-]+')
+_COMMENT_RE = re.compile(r'/\*(?!!).*?\*/', re.DOTALL)
+_BANNER_RE = re.compile(r'/\*!.*?\*/', re.DOTALL)
+_CLASS_RE = re.compile(r'\.(-?(?:\\.|[A-Za-z0-9_-])+)')
+# Parts of a selector whose classes do not have to be present
+_IGNORED_SELECTOR_PARTS_RE = re.compile(r'\[[^\]]*\]|:not\([^()]*\)')
+_ICON_CONTENT_RE = re.compile(r'content:\s*"\\([0-9a-fA-F]+)"')
+_FONT_FACE_SRC_RE = re.compile(r'src:[^;}]*')
+
+_critical_css = {'version': None, 'css': ''}
+
+
+def words_in(text):
+    """Return every word that could be a class name in a template or source file."""
+    return set(_WORD_RE.findall(text))
+
+
+def parse(css, pos=0):
+    """
+    Parse CSS into a list of (prelude, body) pairs.
+
+    body is a string of declarations for style rules and @font-face, a nested
+    list for block at-rules such as @media, and None for statements such as
+    @charset. Returns (rules, position after the closing brace).
+    """
+    rules = []
+    start = pos
+    while pos < len(css):
+        char = css[pos]
+        if char in '"\'':
+            pos = _string_end(css, pos)
+        elif char == ';' and css[start:pos].lstrip().startswith('@'):
+            rules.append((css[start:pos].strip(), None))
+            start = pos + 1
+        elif char == '{':
+            prelude = css[start:pos].strip()
+            if prelude.startswith('@') and not prelude.startswith(DECLARATION_AT_RULES):
+                body, pos = parse(css, pos + 1)
+            else:
+                end = _block_end(css, pos + 1)
+                body, pos = css[pos + 1:end], end + 1
+            rules.append((prelude, body))
+            start = pos
+            continue
+        elif char == '}':
+            return rules, pos + 1
+        pos += 1
+    return rules, pos
+
+
+def _string_end(css, pos):
+    """Return the index of the quote closing the string that starts at pos."""
+    quote = css[pos]
+    pos += 1
+    while css[pos] != quote:
+        pos += 2 if css[pos] == '\\' else 1
+    return pos
+
+
+def _block_end(css, pos):
+    """Return the index of the brace closing a declaration block."""
+    while css[pos] != '}':
+        if css[pos] in '"\'':
+            pos = _string_end(css, pos)
+        pos += 1
+    return pos
+
+
+def _split_selectors(prelude):
+    """Split a selector list on top-level commas."""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return [selector.strip() for selector in selectors]
+
+
+def _selector_used(selector, used):
+    selector = _IGNORED_SELECTOR_PARTS_RE.sub('', selector)
+    return all(name.replace('\\', '') in used for name in _CLASS_RE.findall(selector))
+
+
+def purge(rules, used, keep_font_face=True):
+    """Drop the selectors whose classes are not all in used, and rules left empty."""
+    kept = []
+    for prelude, body in rules:
+        if body is None:
+            kept.append((prelude, body))
+        elif isinstance(body, list):
+            body = purge(body, used, keep_font_face)
+            if body:
+                kept.append((prelude, body))
+        elif prelude.startswith('@'):
+            if keep_font_face or not prelude.startswith('@font-face'):
+                kept.append((prelude, body))
+        else:
+            selectors = [selector for selector in _split_selectors(prelude) if _selector_used(selector, used)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def serialize(rules):
+    return ''.join(
+        f'{prelude};' if body is None
+        else f'{prelude}{{{serialize(body) if isinstance(body, list) else body}}}'
+        for prelude, body in rules
+    )
+
+
+def icon_codepoints(rules):
+    """Return the icon font codepoints used by the (purged) icon rules."""
+    codepoints = set()
+    for _, body in rules:
+        if isinstance(body, list):
+            codepoints |= icon_codepoints(body)
+        elif body:
+            codepoints.update(int(value, 16) for value in _ICON_CONTENT_RE.findall(body))
+    return codepoints
+
+
+def point_font_face(rules, url):
+    """Point every @font-face src at a single woff2 file."""
+    return [
+        (prelude, _FONT_FACE_SRC_RE.sub(f'src:url("{url}") format("woff2")', body))
+        if prelude.startswith('@font-face') else (prelude, body)
+        for prelude, body in rules
+    ]
+
+
+def load_source(name):
+    """Return a static CSS file split into its license banners and parsed rules."""
+    with open(finders.find(name), encoding='utf-8') as f:
+        css = f.read()
+    banners = ''.join(_BANNER_RE.findall(css))
+    css = _COMMENT_RE.sub('', _BANNER_RE.sub('', css))
+    return banners, parse(css)[0]
+
+
+def critical_css():
+    """Return the built critical CSS, or '' if build_css has not run."""
+    if not settings.PURGED_CSS:
+        return ''
+    path = finders.find(CRITICAL_CSS)
+    if path is None or finders.find(SITE_CSS) is None:
+        return ''
+
+    version = (path, os.path.getmtime(path))
+    if version != _critical_css['version']:
+        with open(path, encoding='utf-8') as f:
+            _critical_css['css'] = f.read()
+        _critical_css['version'] = version
+    return _critical_css['css']
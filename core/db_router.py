@@ -0,0 +1,153 @@
+"""
+Read-replica routing.
+
+Reads go to the "replica" database alias only inside views marked with
+@read_from_replica and admin changelists using ReplicaChangelistMixin, and
+only for GET/HEAD requests. Every write goes to "default". After a write
+request (or a view marked @pin_to_primary, such as the checkout return) the
+client gets a short-lived cookie that sends its reads to the primary, so users
+never see replication lag on their own changes.
+
+Without a "replica" database configured everything reads from "default".
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+REPLICA = 'replica'
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Sessions must never be read stale, or a user could appear logged out
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in connections.settings
+
+
+class ReplicaRouter:
+    """Send reads to the replica while replica reads are enabled for the current request."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+def can_use_replica(request):
+    return (
+        replica_configured()
+        and request.method in SAFE_METHODS
+        and PIN_COOKIE not in request.COOKIES
+    )
+
+
+@contextmanager
+def replica_reads(request):
+    """Route reads in the block to the replica if the request allows it."""
+    token = _use_replica.set(can_use_replica(request))
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_from_replica(view_func):
+    """Decorator for read-mostly views whose GETs can be served from the replica."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            with replica_reads(request):
+                return await view_func(request, *args, **kwargs)
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            with replica_reads(request):
+                return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def pin_response(response):
+    """Send the client's reads to the primary for REPLICA_PIN_SECONDS."""
+    if not replica_configured():
+        return response
+    response.set_cookie(
+        PIN_COOKIE,
+        '1',
+        max_age=settings.REPLICA_PIN_SECONDS,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+def pin_to_primary(view_func):
+    """Decorator for GET views after which the user expects to see fresh data."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            return pin_response(await view_func(request, *args, **kwargs))
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            return pin_response(view_func(request, *args, **kwargs))
+    return _wrapped_view
+
+
+class ReplicaPinMiddleware:
+    """Pin the client to the primary after any write request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            pin_response(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            pin_response(response)
+        return response
+
+
+class ReplicaChangelistMixin:
+    """ModelAdmin mixin that serves changelist pages from the replica."""
+
+    def changelist_view(self, request, extra_context=None):
+        with replica_reads(request):
+            response = super().changelist_view(request, extra_context)
+            # The result list is only queried when the TemplateResponse renders
+            if hasattr(response, 'render'):
+                response.render()
+            return response
@@ -0,0 +1,91 @@
+"""
+Responsive image variants.
+
+The build_images command (also run by collectstatic) resizes the source
+JPEGs in static/img/ to several widths and encodes each width as AVIF, WebP
+and JPEG under static/img/responsive/. A manifest records the variants so the
+<c-picture> component can emit srcset/sizes and intrinsic width/height.
+Images that have not been built are served as the original file.
+"""
+import json
+import os
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+
+# Source images, relative to the static directory
+SOURCE_DIR = 'img'
+OUTPUT_DIR = 'img/responsive'
+MANIFEST_NAME = f'{OUTPUT_DIR}/manifest.json'
+
+# Widths are capped at the source width, so small sources get fewer variants
+WIDTHS = (480, 960, 1440, 1920, 2560)
+
+# Preferred format first; the last one is the <img> fallback
+FORMATS = (
+    ('avif', 'image/avif', {'quality': 50}),
+    ('webp', 'image/webp', {'quality': 75, 'method': 6}),
+    ('jpg', 'image/jpeg', {'quality': 75, 'optimize': True, 'progressive': True}),
+)
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+_manifest = {'version': None, 'images': {}}
+
+
+def static_dir():
+    """Return the first STATICFILES_DIRS entry, where the source images live."""
+    return os.path.join(settings.BASE_DIR, settings.STATICFILES_DIRS[0])
+
+
+def variant_name(source, width, extension):
+    """Return the static path of one variant, e.g. img/responsive/hero-960.webp."""
+    stem = os.path.splitext(os.path.relpath(source, SOURCE_DIR))[0]
+    return f'{OUTPUT_DIR}/{stem}-{width}.{extension}'
+
+
+def load_manifest():
+    """Return the manifest, re-reading it only when build_images rewrote it."""
+    path = finders.find(MANIFEST_NAME)
+    if path is None:
+        return {}
+
+    version = (path, os.path.getmtime(path))
+    if version != _manifest['version']:
+        with open(path) as f:
+            _manifest['images'] = json.load(f)
+        _manifest['version'] = version
+    return _manifest['images']
+
+
+def picture(source):
+    """
+    Return the data the picture component renders for a source image.
+
+    Returns a dict with the <source> elements (type and srcset) and the
+    fallback src, srcset, width and height for the <img>.
+    """
+    image = load_manifest().get(source)
+    if image is None:
+        return {'sources': [], 'src': static(source), 'srcset': '', 'width': None, 'height': None}
+
+    srcsets = {
+        mime_type: ', '.join(
+            f'{static(variant_name(source, width, extension))} {width}w'
+            for width in image['widths']
+        )
+        for extension, mime_type, _ in FORMATS
+        if extension in image['formats']
+    }
+    fallback_type = FORMATS[-1][1]
+    return {
+        'sources': [
+            {'type': mime_type, 'srcset': srcset}
+            for mime_type, srcset in srcsets.items()
+            if mime_type != fallback_type
+        ],
+        'src': static(variant_name(source, image['widths'][-1], FORMATS[-1][0])),
+        'srcset': srcsets.get(fallback_type, ''),
+        'width': image['width'],
+        'height': image['height'],
+    }
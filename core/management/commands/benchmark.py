@@ -0,0 +1,221 @@
+"""
+Management command to benchmark member-facing views and webhook handlers.
+
+Runs against a throwaway test database seeded with --members members and
+--payments payments each, a private local-memory cache and the in-process
+fake Stripe API, so results are reproducible and no real data, shared cache
+or Stripe account is touched. Each case in
+core.benchmarks is warmed up and then timed, and the queries per call are
+recorded. Save the results as a JSON baseline with --save. A later run with
+--compare fails if any case runs more queries, or if its median gets slower
+by more than both --tolerance and --min-delta.
+"""
+from datetime import datetime, timezone
+import json
+import platform
+import statistics
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from accounts.fake_stripe import use_fake_stripe
+from core.benchmarks import CASES, Fixtures
+
+PRIVATE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark member-facing views and webhook handlers against seeded data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--members',
+            type=int,
+            default=200,
+            help='Number of members to seed (default: 200)'
+        )
+        parser.add_argument(
+            '--payments',
+            type=int,
+            default=24,
+            help='Payments per member (default: 24)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Timed calls per case (default: 20)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Untimed calls per case before timing starts (default: 3)'
+        )
+        parser.add_argument(
+            '--only',
+            action='append',
+            default=[],
+            help='Only run cases whose name contains this text (repeatable, e.g. --only view: --only admin:)'
+        )
+        parser.add_argument(
+            '--stripe-latency',
+            type=float,
+            default=0,
+            help='Milliseconds the fake Stripe API adds to each call in the stripe: cases (default: 0)'
+        )
+        parser.add_argument(
+            '--save',
+            metavar='PATH',
+            help='Write the results to a JSON baseline file'
+        )
+        parser.add_argument(
+            '--compare',
+            metavar='PATH',
+            help='Compare against a saved baseline and fail on regressions'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Allowed median latency increase over the baseline, as a fraction (default: 0.25)'
+        )
+        parser.add_argument(
+            '--min-delta',
+            type=float,
+            default=1.0,
+            help='Ignore median latency increases smaller than this many milliseconds (default: 1)'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2')
+
+        cases = {
+            name: factory for name, factory in CASES.items()
+            if not options['only'] or any(text in name for text in options['only'])
+        }
+        if not cases:
+            raise CommandError('No benchmark cases match --only')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read baseline {options['compare']}: {str(e)}")
+
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=PRIVATE_CACHES), use_fake_stripe(latency_ms=options['stripe_latency']) as fake:
+                started = time.perf_counter()
+                fixtures = Fixtures(options['members'], options['payments'], fake.url)
+                self.stdout.write(
+                    f"Seeded {options['members']} members x {options['payments']} payments "
+                    f"in {time.perf_counter() - started:.1f}s\n"
+                )
+                results = {
+                    name: self._measure(factory(fixtures), options['warmup'], options['iterations'])
+                    for name, factory in cases.items()
+                }
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'members': options['members'],
+                'payments': options['payments'],
+                'iterations': options['iterations'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            },
+            'results': results,
+        }
+
+        regressions = self._print(results, baseline, options['tolerance'], options['min_delta'])
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f"\nSaved baseline to {options['save']}")
+
+        if baseline:
+            for key in ('members', 'payments', 'database'):
+                if baseline.get('meta', {}).get(key) != report['meta'][key]:
+                    self.stdout.write(self.style.WARNING(
+                        f"Baseline was recorded with {key}={baseline['meta'].get(key)!r}, "
+                        f"this run used {report['meta'][key]!r}"
+                    ))
+            if regressions:
+                raise CommandError(f'{regressions} benchmark regressions against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def _measure(self, call, warmup, iterations):
+        for _ in range(warmup):
+            call()
+
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(statistics.quantiles(timings, n=20)[-1], 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': max(queries),
+        }
+
+    def _print(self, results, baseline, tolerance, min_delta):
+        """Print the results table, returning the number of regressions."""
+        previous = (baseline or {}).get('results', {})
+        regressions = 0
+
+        self.stdout.write(f"{'case':<42} {'median ms':>10} {'p95 ms':>9} {'queries':>8}  baseline")
+        for name, result in results.items():
+            line = f"{name:<42} {result['median_ms']:>10.2f} {result['p95_ms']:>9.2f} {result['queries']:>8}"
+            base = previous.get(name)
+            if base is None:
+                self.stdout.write(line + ('  (new)' if baseline else ''))
+                continue
+
+            change = result['median_ms'] / base['median_ms'] - 1 if base['median_ms'] else 0
+            notes = [f'{change:+.0%}']
+            failed = False
+            if result['queries'] > base['queries']:
+                notes.append(f"queries {base['queries']} -> {result['queries']}")
+                failed = True
+            # Sub-millisecond cases swing by large fractions from noise alone
+            if change > tolerance and result['median_ms'] - base['median_ms'] >= min_delta:
+                notes.append('slower')
+                failed = True
+
+            if failed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f"{line}  {', '.join(notes)}"))
+            else:
+                self.stdout.write(f"{line}  {', '.join(notes)}")
+        return regressions
@@ -0,0 +1,114 @@
+"""
+Management command to build the purged site stylesheet, critical CSS and icon font subset.
+"""
+import os
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from core.css import (
+    CRITICAL_CSS, CRITICAL_TEMPLATES, ICON_FONT, PURGED_SOURCES, PYTHON_SOURCE_DIRS, SAFELIST, SITE_CSS,
+    UNPURGED_SOURCES, icon_codepoints, load_source, point_font_face, purge, serialize, words_in,
+)
+from core.images import static_dir
+
+try:
+    from fontTools import subset
+except ImportError:
+    subset = None
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+class Command(BaseCommand):
+    help = 'Build a purged stylesheet, critical CSS and an icon font subset from the templates'
+
+    def handle(self, *args, **options):
+        root = static_dir()
+        used = self._template_words() | SAFELIST
+        critical = self._critical_words() | SAFELIST
+
+        banners, site_rules, critical_rules = '', [], []
+        original_size = 0
+        for name in PURGED_SOURCES + UNPURGED_SOURCES:
+            original_size += os.path.getsize(finders.find(name))
+            banner, rules = load_source(name)
+            # @charset is only valid as the very first rule of the output
+            rules = [(prelude, body) for prelude, body in rules if not prelude.startswith('@charset')]
+            banners += banner
+            site_rules += purge(rules, used) if name in PURGED_SOURCES else rules
+            critical_rules += purge(rules, critical, keep_font_face=False)
+
+        site_rules = point_font_face(site_rules, self._icon_font(root, site_rules))
+
+        site_css = f'@charset "UTF-8";{banners}{serialize(site_rules)}'
+        critical_css = serialize(critical_rules)
+        for name, css in ((SITE_CSS, site_css), (CRITICAL_CSS, critical_css)):
+            path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(css)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {SITE_CSS} ({len(site_css.encode()) // 1024} KB, from {original_size // 1024} KB) '
+            f'and {CRITICAL_CSS} ({len(critical_css.encode()) // 1024} KB)'
+        ))
+
+    def _template_dirs(self):
+        """Template directories of the project and of non-Django apps."""
+        dirs = [str(path) for engine in settings.TEMPLATES for path in engine.get('DIRS', [])]
+        for app_config in apps.get_app_configs():
+            # The admin brings its own stylesheets
+            if not app_config.name.startswith('django.'):
+                dirs.append(os.path.join(app_config.path, 'templates'))
+        return [path for path in dirs if os.path.isdir(path)]
+
+    def _template_words(self):
+        words = set()
+        for directory in self._template_dirs():
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    if filename.endswith(TEMPLATE_EXTENSIONS):
+                        words |= self._file_words(os.path.join(dirpath, filename))
+
+        for directory in PYTHON_SOURCE_DIRS:
+            for dirpath, _, filenames in os.walk(os.path.join(settings.BASE_DIR, directory)):
+                for filename in filenames:
+                    if filename.endswith('.py'):
+                        words |= self._file_words(os.path.join(dirpath, filename))
+        return words
+
+    def _critical_words(self):
+        words = set()
+        for name in CRITICAL_TEMPLATES:
+            words |= self._file_words(get_template(name).origin.name)
+        return words
+
+    def _file_words(self, path):
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            return words_in(f.read())
+
+    def _icon_font(self, root, site_rules):
+        """Write the icon font subset and return its URL relative to the built stylesheet."""
+        source = finders.find('css/fonts/bootstrap-icons.woff2')
+        if subset is None:
+            self.stderr.write('fontTools is not installed, using the full icon font')
+            return '../fonts/bootstrap-icons.woff2'
+
+        codepoints = icon_codepoints(site_rules)
+        options = subset.Options()
+        options.flavor = 'woff2'
+        font = subset.load_font(source, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+
+        path = os.path.join(root, ICON_FONT)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        subset.save_font(font, path, options)
+        self.stdout.write(
+            f'Subset icon font to {len(codepoints)} glyphs '
+            f'({os.path.getsize(path) // 1024} KB, from {os.path.getsize(source) // 1024} KB)'
+        )
+        return os.path.relpath(ICON_FONT, os.path.dirname(SITE_CSS))
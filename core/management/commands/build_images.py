@@ -0,0 +1,87 @@
+"""
+Management command to build responsive WebP/AVIF/JPEG variants of the static images.
+"""
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from core.images import FORMATS, MANIFEST_NAME, OUTPUT_DIR, SOURCE_DIR, SOURCE_EXTENSIONS, WIDTHS
+from core.images import static_dir, variant_name
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+
+class Command(BaseCommand):
+    help = 'Build resized AVIF, WebP and JPEG variants of the images in static/img'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild variants even if they are newer than the source image'
+        )
+
+    def handle(self, *args, **options):
+        if Image is None:
+            raise CommandError('build_images requires Pillow (pip install pillow)')
+
+        root = static_dir()
+        formats = [
+            (extension, save_options)
+            for extension, _, save_options in FORMATS
+            if extension == 'jpg' or features.check(extension)
+        ]
+        skipped_formats = {extension for extension, _, _ in FORMATS} - {extension for extension, _ in formats}
+        if skipped_formats:
+            self.stderr.write(f"Pillow has no encoder for {', '.join(sorted(skipped_formats))}, skipping")
+
+        manifest = {}
+        built = 0
+        for source in self._sources(root):
+            path = os.path.join(root, source)
+            with Image.open(path) as image:
+                # Phone photos are often stored sideways with an EXIF rotation
+                image = ImageOps.exif_transpose(image).convert('RGB')
+                widths = [width for width in WIDTHS if width < image.width] or [image.width]
+
+                for width in widths:
+                    height = round(image.height * width / image.width)
+                    resized = None
+                    for extension, save_options in formats:
+                        output = os.path.join(root, variant_name(source, width, extension))
+                        if not options['force'] and self._is_current(output, path):
+                            continue
+                        if resized is None:
+                            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                        os.makedirs(os.path.dirname(output), exist_ok=True)
+                        resized.save(output, **save_options)
+                        built += 1
+
+                manifest[source] = {
+                    'width': widths[-1],
+                    'height': round(image.height * widths[-1] / image.width),
+                    'widths': widths,
+                    'formats': [extension for extension, _ in formats],
+                }
+
+        with open(os.path.join(root, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Built {built} image variants for {len(manifest)} images'))
+
+    def _sources(self, root):
+        """Yield the source images, relative to the static directory."""
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, SOURCE_DIR)):
+            # Never treat our own output as a source
+            dirnames[:] = [
+                name for name in dirnames
+                if os.path.relpath(os.path.join(dirpath, name), root) != os.path.normpath(OUTPUT_DIR)
+            ]
+            for filename in sorted(filenames):
+                if filename.lower().endswith(SOURCE_EXTENSIONS):
+                    yield os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, '/')
+
+    def _is_current(self, output, source):
+        return os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source)
@@ -0,0 +1,29 @@
+"""
+collectstatic that builds the responsive images and purged CSS first.
+"""
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+from django.core.management import call_command
+
+
+class Command(CollectStaticCommand):
+    help = CollectStaticCommand.help + ' Runs build_images and build_css first.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--skip-images',
+            action='store_true',
+            help='Do not run build_images before collecting'
+        )
+        parser.add_argument(
+            '--skip-css',
+            action='store_true',
+            help='Do not run build_css before collecting'
+        )
+
+    def handle(self, **options):
+        if not options['skip_images']:
+            call_command('build_images', verbosity=options['verbosity'])
+        if not options['skip_css']:
+            call_command('build_css', verbosity=options['verbosity'])
+        return super().handle(**options)
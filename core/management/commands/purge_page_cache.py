@@ -0,0 +1,20 @@
+"""
+Management command to invalidate the anonymous page cache and template fragments.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.caches import cache_is_shared
+from core.page_cache import purge_page_cache
+
+
+class Command(BaseCommand):
+    help = 'Invalidate every cached page and template fragment'
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            # The generation counter would only change inside this process
+            raise CommandError(
+                'The default cache is private to each process, so a purge cannot reach '
+                'the web workers. Set REDIS_URL, or restart the workers to clear their caches.'
+            )
+        generation = purge_page_cache()
+        self.stdout.write(self.style.SUCCESS(f'Page cache purged (generation {generation})'))
@@ -0,0 +1,22 @@
+"""
+Management command to compile every template, failing if any does not load.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.template_warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = 'Compile all project templates through the cached loader and report failures'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        compiled, errors = warm_templates()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        for name, error in errors:
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(f'{len(errors)} templates failed to compile')
+
+        self.stdout.write(self.style.SUCCESS(f'Compiled {compiled} templates in {elapsed_ms:.0f}ms'))
@@ -0,0 +1,117 @@
+"""
+Prometheus metrics for the webhook and checkout pipelines.
+
+Metrics are kept in process by prometheus_client and exposed at /metrics
+(see core.views.metrics). Under a multi-worker server set
+PROMETHEUS_MULTIPROC_DIR to an empty directory before the workers start; each
+process then writes its samples there and a scrape of any worker returns the
+totals across all of them. Webhook backlog figures are read from the
+WebhookEvent table at scrape time, so they are correct in either mode.
+"""
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+WEBHOOK_EVENTS = Counter(
+    'stripe_webhook_events_total',
+    'Stripe webhook deliveries by event type and outcome',
+    ['event_type', 'outcome'],
+)
+WEBHOOK_SIGNATURE_SECONDS = Histogram(
+    'stripe_webhook_signature_seconds',
+    'Time spent verifying webhook signatures',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+WEBHOOK_HANDLER_SECONDS = Histogram(
+    'stripe_webhook_handler_seconds',
+    'Time spent applying a webhook event to the database',
+    ['event_type'],
+)
+WEBHOOK_LATENCY_SECONDS = Histogram(
+    'stripe_webhook_latency_seconds',
+    'Time from Stripe creating an event to it being processed',
+    ['event_type'],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
+)
+CHECKOUT_SESSION_SECONDS = Histogram(
+    'stripe_checkout_session_seconds',
+    'Time to create a Stripe checkout session',
+    ['mode', 'outcome'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+STRIPE_API_SECONDS = Histogram(
+    'stripe_api_request_seconds',
+    'Stripe API request latency by endpoint',
+    ['endpoint', 'status'],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def observe_webhook(event, outcome, handler_seconds):
+    """Record a webhook event that went through its handler."""
+    event_type = event.get('type', 'unknown')
+    WEBHOOK_EVENTS.labels(event_type, outcome).inc()
+    WEBHOOK_HANDLER_SECONDS.labels(event_type).observe(handler_seconds)
+    if outcome == 'processed' and event.get('created'):
+        WEBHOOK_LATENCY_SECONDS.labels(event_type).observe(max(time.time() - event['created'], 0))
+
+
+def observe_stripe_call(endpoint, duration_ms, status_code):
+    """stripe_client latency hook, registered in CoreConfig.ready."""
+    STRIPE_API_SECONDS.labels(endpoint, str(status_code or 'error')).observe(duration_ms / 1000)
+
+
+class WebhookBacklogCollector:
+    """Webhook queue depth and age, read from the WebhookEvent table on each scrape."""
+
+    def describe(self):
+        # Keeps registration from running the queries
+        return []
+
+    def collect(self):
+        from django.db.models import Count
+        from django.utils import timezone
+        from accounts.models import WebhookEvent
+
+        events = GaugeMetricFamily(
+            'stripe_webhook_queue_events',
+            'Webhook events in the ledger that are not yet processed',
+            labels=['status'],
+        )
+        counts = dict(
+            WebhookEvent.objects
+            .exclude(status='processed')
+            .values_list('status')
+            .annotate(count=Count('id'))
+        )
+        for status in ('pending', 'processing', 'failed'):
+            events.add_metric([status], counts.get(status, 0))
+        yield events
+
+        oldest = (
+            WebhookEvent.objects
+            .filter(status='pending')
+            .order_by('id')
+            .values_list('received_at', flat=True)
+            .first()
+        )
+        yield GaugeMetricFamily(
+            'stripe_webhook_oldest_pending_seconds',
+            'Age of the oldest pending webhook event',
+            value=(timezone.now() - oldest).total_seconds() if oldest else 0,
+        )
+
+
+_scrape_registry = CollectorRegistry()
+_scrape_registry.register(WebhookBacklogCollector())
+
+
+def exposition():
+    """Return every metric in the Prometheus text format."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_scrape_registry)
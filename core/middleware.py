@@ -0,0 +1,219 @@
+"""
+Project middleware.
+"""
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from urllib.parse import urlparse
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from accounts.views.stripe_client import register_latency_hook
+from core import request_metrics
+
+logger = logging.getLogger(__name__)
+
+# Older mimetypes tables do not know these
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('font/woff2', '.woff2')
+
+# Content-hashed files never change, so browsers may cache them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Preferred encoding first, with the suffix collectstatic gives its copy
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_ACCEPT_ENCODING_RE = re.compile(r'\s*([a-z*]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?', re.IGNORECASE)
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows."""
+    accepted = set()
+    for part in header.split(','):
+        match = _ACCEPT_ENCODING_RE.match(part)
+        if match and float(match.group(2) or 1) > 0:
+            accepted.add(match.group(1).lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT.
+
+    Files whose name is in the staticfiles manifest (the content-hashed copies)
+    get a one-year immutable Cache-Control; anything else is revalidated. The
+    precompressed .br/.gz siblings written by CompressedManifestStaticFilesStorage
+    are sent with Content-Encoding when the client accepts them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = urlparse(settings.STATIC_URL).path
+        self.root = Path(settings.STATIC_ROOT).resolve()
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.max_age = settings.STATIC_MAX_AGE
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.is_static(request):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_static(request):
+            # The file checks hit the disk, so keep them off the event loop
+            response = await sync_to_async(self.serve, thread_sensitive=False)(
+                request, request.path_info[len(self.prefix):]
+            )
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def is_static(self, request):
+        return request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix)
+
+    def serve(self, request, name):
+        try:
+            path = Path(safe_join(self.root, name))
+        except SuspiciousFileOperation:
+            return None
+        if not path.is_file():
+            return None
+
+        served, encoding, vary = path, None, False
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for coding, suffix in ENCODINGS:
+            compressed = path.with_name(path.name + suffix)
+            if compressed.is_file():
+                vary = True
+                if coding in accepted:
+                    served, encoding = compressed, coding
+                    break
+
+        stat = served.stat()
+        if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path.name)
+            response = FileResponse(served.open('rb'), content_type=content_type or 'application/octet-stream')
+            # FileResponse names the file it opened, which may be the .br/.gz copy
+            response.headers.pop('Content-Disposition', None)
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        if vary:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if name in self.immutable:
+            response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Count queries and time the database, Stripe calls and template rendering
+    for each request.
+
+    Every request logs one "request_metrics" line; a request that runs the same
+    SQL statement more than QUERY_REPEAT_THRESHOLD times (the signature of an
+    N+1 query) logs a warning instead. With SERVER_TIMING enabled the timings
+    are also sent in a Server-Timing header, which browser dev tools show in
+    the network panel.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.static_prefix = urlparse(settings.STATIC_URL).path
+        register_latency_hook(request_metrics.record_stripe_call)
+        connection_created.connect(request_metrics.install_db_wrapper, dispatch_uid='request_metrics')
+        for connection in connections.all(initialized_only=True):
+            request_metrics.install_db_wrapper(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path_info.startswith(self.static_prefix):
+            return self.get_response(request)
+
+        metrics, token = request_metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics.finish(token)
+
+        return self.process_response(request, response, metrics)
+
+    async def __acall__(self, request):
+        if request.path_info.startswith(self.static_prefix):
+            return await self.get_response(request)
+
+        metrics, token = request_metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_metrics.finish(token)
+
+        return self.process_response(request, response, metrics)
+
+    def process_response(self, request, response, metrics):
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(metrics)
+        self.log(request, response, metrics)
+        return response
+
+    def server_timing(self, metrics):
+        return ', '.join([
+            f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+            f'stripe;dur={metrics.stripe_ms:.1f};desc="{metrics.stripe_calls} calls"',
+            f'tpl;dur={metrics.template_ms:.1f};desc="templates"',
+            f'total;dur={metrics.total_ms:.1f}',
+        ])
+
+    def log(self, request, response, metrics):
+        sql, repeats = metrics.most_repeated_query()
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(metrics.total_ms, 1),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_ms, 1),
+            'max_repeats': repeats,
+            'stripe_calls': metrics.stripe_calls,
+            'stripe_ms': round(metrics.stripe_ms, 1),
+            'template_ms': round(metrics.template_ms, 1),
+        }
+        message = 'request_metrics ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if repeats > settings.QUERY_REPEAT_THRESHOLD:
+            logger.warning(f"{message} n_plus_one=true sql={sql[:200]!r}", extra={'request_metrics': fields})
+        else:
+            logger.info(message, extra={'request_metrics': fields})
@@ -0,0 +1,81 @@
+"""
+Full-page caching for anonymous visitors.
+
+Cache keys include PAGE_CACHE_VERSION (set per deploy) and a generation
+counter stored in the cache itself, so `manage.py purge_page_cache` drops
+every cached page and fragment by bumping the counter instead of deleting keys.
+"""
+from functools import wraps
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+GENERATION_KEY = 'page_cache:generation'
+
+# Ad and analytics parameters that do not change what a page renders
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'msclkid')
+
+
+def page_cache_version():
+    """Return the current cache version, e.g. "abc123.4" (deploy version + generation)."""
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    return f'{settings.PAGE_CACHE_VERSION}.{generation}'
+
+
+def purge_page_cache():
+    """Invalidate every cached page and fragment. Returns the new generation."""
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        # No generation yet, so nothing has been cached under one either
+        cache.set(GENERATION_KEY, 2, None)
+        return 2
+
+
+def _page_key(request, version):
+    params = sorted(
+        (name, value)
+        for name, value in request.GET.items()
+        if not name.startswith(TRACKING_PARAMS)
+    )
+    query = '&'.join(f'{name}={value}' for name, value in params)
+    return f'page:{version}:{request.path}?{query}'
+
+
+def cache_anonymous_page(view_func):
+    """
+    Serve a view's output from the cache for anonymous GET and HEAD requests.
+
+    Only for views whose output is the same for every anonymous visitor.
+    Requests with pending messages bypass the cache so the messages render,
+    and responses that set cookies, use a CSRF token or are not 200 are never
+    stored.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            # len() does not mark the messages as seen
+            or len(get_messages(request))
+        ):
+            return view_func(request, *args, **kwargs)
+
+        key = _page_key(request, page_cache_version())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        response = view_func(request, *args, **kwargs)
+        # A page that used a CSRF token is specific to this visitor
+        csrf_used = request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        if response.status_code == 200 and not response.streaming and not response.cookies and not csrf_used:
+            cache.set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return _wrapped_view
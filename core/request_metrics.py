@@ -0,0 +1,107 @@
+"""
+Per-request query, Stripe and template timings.
+
+RequestMetricsMiddleware (core.middleware) starts a RequestMetrics for each
+request. Database queries are counted by an execute wrapper installed on
+every connection (install_db_wrapper), Stripe calls through the stripe_client latency hook, and template rendering
+through the InstrumentedDjangoTemplates backend (core.template_backend).
+"""
+from collections import Counter
+from contextvars import ContextVar
+import time
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters and timings for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.statements = Counter()
+        self.stripe_calls = 0
+        self.stripe_ms = 0.0
+        self.template_ms = 0.0
+        self._template_depth = 0
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def most_repeated_query(self):
+        """Return (sql, count) for the statement run most often, or (None, 0)."""
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """Execute wrapper that counts and times queries."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+def start():
+    """Start collecting metrics for the current request; returns (metrics, token)."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    """Return the current request's RequestMetrics, or None outside a request."""
+    return _current.get()
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """Execute wrapper passing queries to the current request's RequestMetrics."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.db_wrapper(execute, sql, params, many, context)
+
+
+def install_db_wrapper(connection, **kwargs):
+    """
+    Add db_wrapper to a connection; a connection_created receiver.
+
+    The wrapper stays on the connection rather than being added per request,
+    because under ASGI the queries run in sync_to_async threads, whose
+    connections are not the ones the middleware sees. The context variable
+    holding the request's metrics is copied to those threads.
+    """
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def record_stripe_call(endpoint, duration_ms, status_code):
+    """stripe_client latency hook."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.stripe_calls += 1
+        metrics.stripe_ms += duration_ms
+
+
+class template_timer:
+    """Context manager timing a template render; nested renders count once."""
+
+    def __enter__(self):
+        self.metrics = _current.get()
+        if self.metrics is not None:
+            self.metrics._template_depth += 1
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.metrics is not None:
+            self.metrics._template_depth -= 1
+            if self.metrics._template_depth == 0:
+                self.metrics.template_ms += (time.perf_counter() - self.started) * 1000
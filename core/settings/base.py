@@ -36,6 +36,8 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    # Project app first so its collectstatic command overrides the staticfiles one
+    "core",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -56,32 +58,59 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.auth.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "core.db_router.ReplicaPinMiddleware",
 ]
 
+# Per-request query counts and DB, Stripe and template timings (see
+# core.middleware.RequestMetricsMiddleware). A request running one SQL statement
+# more than QUERY_REPEAT_THRESHOLD times is logged as a likely N+1 query.
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'True').lower() in ('true', '1', 'yes')
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True').lower() in ('true', '1', 'yes')
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', '10'))
+
+# Bearer token Prometheus must send to scrape /metrics (see core.metrics).
+# Without one the endpoint is only served when DEBUG is on.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that records render time for RequestMetricsMiddleware
+        "BACKEND": "core.template_backend.InstrumentedDjangoTemplates",
+        "NAME": "django",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            # Compiled templates (including cotton's output) are kept per
+            # process; the dev server's autoreloader resets them on change
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django_cotton.cotton_loader.Loader",
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
+            "builtins": ["django_cotton.templatetags.cotton"],
         },
     },
 ]
 
+# Compile all templates when a worker starts (see core.template_warmup)
+TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', 'False').lower() in ('true', '1', 'yes')
+
 WSGI_APPLICATION = "core.wsgi.application"
 
 
@@ -92,9 +121,55 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock when a transaction starts, so busy_timeout
+            # applies instead of a mid-transaction "database is locked"
+            "transaction_mode": "IMMEDIATE",
+        },
+    }
+}
+
+# Reads from a "replica" alias, when one is configured (see core.db_router)
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Seconds a client reads from the primary after a write
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '15'))
+
+# Applied to every new SQLite connection (see core.signals)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The local-memory cache is per process; production.py switches to Redis when
+# REDIS_URL is set so invalidations reach every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
+# Seconds a user's membership entitlement stays cached (see accounts.entitlements)
+ENTITLEMENT_CACHE_TTL = int(os.environ.get('ENTITLEMENT_CACHE_TTL', '300'))
+
+# Sessions are read from the cache and written through to the database;
+# "django.contrib.sessions.backends.signed_cookies" avoids the database entirely
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+# Seconds request.user stays cached (see accounts.auth)
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '300'))
+
+# Anonymous full-page and fragment cache (see core.page_cache). Set
+# PAGE_CACHE_VERSION per deploy, e.g. to the git SHA, so new templates show up.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '600'))
+PAGE_CACHE_VERSION = os.environ.get('PAGE_CACHE_VERSION', '1')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,6 +209,9 @@ STATIC_URL = "static/"
 STATIC_ROOT = "staticfiles"
 STATICFILES_DIRS = ["static/"]
 
+# Cache lifetime for static files without a content hash in their name
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '60'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -169,6 +247,13 @@ ACCOUNT_FORMS = {
 # Email backend (console for development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Queue outgoing email in the QueuedEmail table instead of sending it during the
+# request; `manage.py send_queued_email` delivers it through EMAIL_DELIVERY_BACKEND
+EMAIL_QUEUE = os.environ.get('EMAIL_QUEUE', 'False').lower() in ('true', '1', 'yes')
+EMAIL_DELIVERY_BACKEND = EMAIL_BACKEND
+if EMAIL_QUEUE:
+    EMAIL_BACKEND = 'accounts.mail.QueuedEmailBackend'
+
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/account/'
@@ -182,3 +267,20 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLIC_KEY', '')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
+
+# Ack-first webhook handling: when enabled, verified events are written to the
+# WebhookEvent queue and processed by `manage.py process_webhooks`
+STRIPE_WEBHOOK_QUEUE = os.environ.get('STRIPE_WEBHOOK_QUEUE', 'False').lower() in ('true', '1', 'yes')
+
+# Stripe HTTP client: keep-alive pool size, timeouts (seconds) and SDK retries
+STRIPE_HTTP_POOL_SIZE = int(os.environ.get('STRIPE_HTTP_POOL_SIZE', '10'))
+STRIPE_CONNECT_TIMEOUT = float(os.environ.get('STRIPE_CONNECT_TIMEOUT', '5'))
+STRIPE_READ_TIMEOUT = float(os.environ.get('STRIPE_READ_TIMEOUT', '30'))
+STRIPE_MAX_NETWORK_RETRIES = int(os.environ.get('STRIPE_MAX_NETWORK_RETRIES', '2'))
+
+# Send Stripe API calls somewhere other than api.stripe.com, such as the local
+# fake from `manage.py fake_stripe` (e.g. http://127.0.0.1:12111)
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', '')
+
+# Serve the purged stylesheet and inline critical CSS built by build_css
+PURGED_CSS = os.environ.get('PURGED_CSS', 'False').lower() in ('true', '1', 'yes')
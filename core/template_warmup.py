@@ -0,0 +1,91 @@
+"""
+Template warm-up.
+
+Compiles every project template through the cached loader, following constant
+{% extends %} and {% include %} names into app templates such as allauth's
+layouts, plus the crispy forms template pack. Run at worker start (see
+core/wsgi.py) so the first requests after a deploy do not pay for template
+parsing and cotton compilation.
+"""
+import logging
+import os
+import time
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.loader_tags import ExtendsNode, IncludeNode
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+
+def _walk(directory, prefix=''):
+    """Yield template names under a template directory, optionally only below prefix."""
+    for dirpath, _, filenames in os.walk(os.path.join(directory, prefix)):
+        for filename in sorted(filenames):
+            if filename.endswith(TEMPLATE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(dirpath, filename), directory).replace(os.sep, '/')
+
+
+def _template_names():
+    names = []
+    for engine in settings.TEMPLATES:
+        for directory in engine.get('DIRS', []):
+            names.extend(_walk(str(directory)))
+
+    # Rendered by {% crispy %} and |crispy rather than referenced by name
+    pack = getattr(settings, 'CRISPY_TEMPLATE_PACK', None)
+    if pack:
+        for app_config in apps.get_app_configs():
+            directory = os.path.join(app_config.path, 'templates')
+            if os.path.isdir(os.path.join(directory, pack)):
+                names.extend(_walk(directory, pack))
+    return names
+
+
+def _referenced_names(template):
+    """Yield the constant template names a compiled template extends or includes."""
+    for node_type, attr in ((ExtendsNode, 'parent_name'), (IncludeNode, 'template')):
+        for node in template.nodelist.get_nodes_by_type(node_type):
+            name = getattr(node, attr).var
+            # Variable names are only known at render time
+            if isinstance(name, str):
+                yield name
+
+
+def warm_templates():
+    """
+    Compile and cache the templates.
+
+    Returns (number of templates compiled, list of (name, error) for
+    templates that failed to load).
+    """
+    engine = engines['django']
+    pending = _template_names()
+    seen = set()
+    errors = []
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            template = engine.get_template(name).template
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            errors.append((name, e))
+            continue
+        pending.extend(_referenced_names(template))
+    return len(seen) - len(errors), errors
+
+
+def warm_templates_on_startup():
+    """Warm the template cache if TEMPLATE_WARMUP is enabled, logging failures."""
+    if not settings.TEMPLATE_WARMUP:
+        return
+
+    started = time.perf_counter()
+    compiled, errors = warm_templates()
+    for name, error in errors:
+        logger.error(f"Template warm-up failed for {name}: {str(error)}")
+    logger.info(f"Warmed {compiled} templates in {(time.perf_counter() - started) * 1000:.0f}ms")
@@ -0,0 +1,10 @@
+from django import template
+from core.css import critical_css
+
+register = template.Library()
+
+
+@register.inclusion_tag('_stylesheets.html')
+def stylesheets():
+    """Render the site's stylesheet links, inlining critical CSS once build_css has run."""
+    return {'critical_css': critical_css()}
@@ -0,0 +1,10 @@
+from django import template
+from core.images import picture
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(source):
+    """Return the srcset data for a static image, e.g. {% responsive_image 'img/hero.jpg' as image %}."""
+    return picture(source)
@@ -1,5 +1,27 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST
+from .metrics import exposition
+from .page_cache import cache_anonymous_page, page_cache_version
 
 
+@cache_anonymous_page
 def home(request):
-    return render(request, "pages/home.html")
+    return render(request, "pages/home.html", {
+        # Authenticated users get the static sections from the fragment cache
+        "page_cache_version": page_cache_version(),
+        "page_cache_timeout": settings.PAGE_CACHE_TIMEOUT,
+    })
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN when it is set."""
+    token = settings.METRICS_TOKEN
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE_LATEST)
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.local")
 
 application = get_wsgi_application()
+
+# Compile templates before the worker takes traffic
+from core.template_warmup import warm_templates_on_startup  # noqa: E402
+warm_templates_on_startup()
+
+# Entitlement and session invalidations only reach other workers through a shared cache
+from core.caches import warn_if_cache_not_shared  # noqa: E402
+warn_if_cache_not_shared()